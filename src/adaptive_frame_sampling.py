@@ -0,0 +1,108 @@
+# adaptive_frame_sampling.py
+import math
+
+import numpy as np
+
+from audio_frame_analysis import CumulativeEnergyCache, analyze_frames, calculate_effective_cutoff, frame_count, frame_geometry
+from audio_loader import flac_stream_info, read_flac_frames_at
+from file_status_determination import ENERGY_RATIO_THRESHOLD, MIN_ACTIVE_FRACTION, RATIO_DROP_THRESHOLD
+
+ADAPTIVE_FIRST_ROUND_FRAMES: int = 32        # Frames sampled before the first check; each later round doubles the total
+ADAPTIVE_MAX_SAMPLED_FRACTION: float = 0.3   # Past this share of a file's frames, a full pass is cheaper than sampling on
+ADAPTIVE_MIN_FRAMES: int = 128               # Shorter files (~47 s at 44.1 kHz) always get the full pass
+ADAPTIVE_Z: float = 2.576                    # Two-sided 99% Wilson interval
+ADAPTIVE_MAX_CONFIDENCE_ERROR: float = 0.15  # Settle only once the active-fraction interval half-width is within this
+
+def wilson_interval(successes, trials, z=ADAPTIVE_Z):
+    """Wilson score interval (lower, upper) for a binomial proportion; (0, 1) without any trial."""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1.0 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1.0 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def sampled_verdict_settled(ratios):
+    """
+    True once a frame sample is decisive enough that a full pass would reach the same
+    ORIGINAL / UPSCALED verdict as determine_file_status() on the sample:
+
+    - the interval on active_fraction (active / significant frames) lies entirely above or below
+      MIN_ACTIVE_FRACTION and its half-width is within ADAPTIVE_MAX_CONFIDENCE_ERROR, or
+    - with confidence, fewer than MIN_ACTIVE_FRACTION of the audible frames carry any measurable energy
+      above the cutoff at all (the "no significant frames" case, where active_fraction is unmeasurable).
+      This needs at least one significant frame in the sample: without any, rare broadband bursts the
+      sample missed can still make the full pass ORIGINAL, so only the full pass decides.
+    """
+    ratios = np.asarray(ratios, dtype=float)
+    num_audible = int(np.count_nonzero(ratios > 0.0))
+    num_significant = int(np.count_nonzero(ratios > RATIO_DROP_THRESHOLD))
+    num_active = int(np.count_nonzero(ratios > ENERGY_RATIO_THRESHOLD))
+
+    lower, upper = wilson_interval(num_active, num_significant)
+    if (upper - lower) / 2.0 <= ADAPTIVE_MAX_CONFIDENCE_ERROR:
+        if lower >= MIN_ACTIVE_FRACTION or upper < MIN_ACTIVE_FRACTION:
+            return True
+
+    if num_significant == 0:
+        return False
+    _, significant_upper = wilson_interval(num_significant, num_audible)
+    return significant_upper < MIN_ACTIVE_FRACTION
+
+def stratified_frame_indices(num_frames, num_strata, exclude, rng):
+    """One random not-yet-sampled frame from each of num_strata equal slices of the track."""
+    edges = np.linspace(0, num_frames, num_strata + 1).astype(int)
+    picks = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        candidates = [i for i in range(lo, hi) if i not in exclude]
+        if candidates:
+            picks.append(int(rng.choice(candidates)))
+    return picks
+
+def analyze_adaptive(file_path, frame_size=None, step=None):
+    """
+    Analyze a stratified sample of frames, decoding only those (by seeking), in rounds of growing size
+    until sampled_verdict_settled(). Returns the same tuple as a full pass, with ratios and the
+    CumulativeEnergyCache covering only the sampled frames (in track order), or None when the file is
+    short, unreadable, or still borderline after ADAPTIVE_MAX_SAMPLED_FRACTION of it: it then needs the
+    full pass. frame_size / step: see frame_geometry().
+    """
+    samplerate, num_samples = flac_stream_info(file_path)
+    if samplerate is None:
+        return None
+    frame_size, step = frame_geometry(samplerate, frame_size, step)
+    num_frames = frame_count(num_samples, frame_size, step)
+    if num_frames < ADAPTIVE_MIN_FRAMES:
+        return None
+
+    effective_cutoff_hz = calculate_effective_cutoff(samplerate)
+    rng = np.random.default_rng(num_samples)        # Deterministic: the same file always gets the same sample
+    max_sampled = int(num_frames * ADAPTIVE_MAX_SAMPLED_FRACTION)
+
+    sampled = set()
+    indices, ratio_chunks, cache_chunks = [], [], []
+    target = ADAPTIVE_FIRST_ROUND_FRAMES
+    while target <= max_sampled:
+        new_indices = sorted(stratified_frame_indices(num_frames, target - len(sampled), sampled, rng))
+        frames = read_flac_frames_at(file_path, new_indices, frame_size, step)
+        if frames is None:
+            return None
+        ratios, energy_cache = analyze_frames(frames, samplerate, effective_cutoff_hz)
+        sampled.update(new_indices)
+        indices.extend(new_indices)
+        ratio_chunks.append(ratios)
+        cache_chunks.append(energy_cache)
+
+        all_ratios = np.concatenate(ratio_chunks)
+        if sampled_verdict_settled(all_ratios):
+            order = np.argsort(indices)
+            energy_cache = CumulativeEnergyCache(
+                freqs_hz=cache_chunks[0].freqs_hz,
+                energy_above=np.concatenate([c.energy_above for c in cache_chunks])[order],
+                total_energy=np.concatenate([c.total_energy for c in cache_chunks])[order],
+            )
+            return all_ratios[order], energy_cache, samplerate, num_samples, effective_cutoff_hz
+        target *= 2
+
+    return None
@@ -1,54 +1,326 @@
 # audio_frame_analysis.py
+import math
 import numpy as np
 
 from dataclasses import dataclass
+from functools import lru_cache
 
 CUTOFF_HZ: float = 20_500.0              # Probe frequency (Hz) - in this case, usual 320 kbps MP3 file cutoff
 NYQUIST_SAFETY_BAND_HZ: float = 100.0    # Keeps test well below Nyquist
+SILENCE_PEAK_THRESHOLD: float = 1e-4     # Frames whose peak amplitude stays below this are treated as silent
+FFT_BATCH_FRAMES: int = 64               # Frames windowed + FFT'd together per 2-D batch (bounds temporary memory)
+REFERENCE_FRAME_SIZE: int = 32768        # Frame length at REFERENCE_SAMPLERATE_HZ (~0.74 s); other rates keep the duration
+REFERENCE_SAMPLERATE_HZ: int = 44100
+MIN_FRAME_SIZE: int = 256
 
 @dataclass
-class FrameFFT:                          # Post-window, post-rFFT cache for one frame
-    freqs_hz: np.ndarray
-    spectrum_abs: np.ndarray
-    total_energy: float
+class CumulativeEnergyCache:             # Post-window, post-rFFT cache for all frames of a file
+    freqs_hz: np.ndarray                 # (columns,) ascending; shared by every frame
+    energy_above: np.ndarray             # (frames, columns) float32: energy strictly above freqs_hz[column]
+    total_energy: np.ndarray             # (frames,) 0.0 for silent/invalid frames
 
-def divide_into_frames(data, frame_size=32768, step=16384):
-    frames = []
-    for start in range(0, len(data) - frame_size + 1, step):    # Divides audio data into overlapping frames for analysis.
-        frames.append(data[start:start+frame_size])
-    return frames
+    def ratios_above(self, cutoff_hz):
+        """Per-frame energy-above-cutoff ratios (one column lookup). Exact when no FFT bin lies between
+        cutoff_hz and the last cached frequency <= cutoff_hz, which always holds at full resolution."""
+        return self.ratios_above_each([cutoff_hz])[:, 0]
+
+    def ratios_above_each(self, cutoffs_hz):
+        """ratios_above() for several cutoffs at once: a (frames, cutoffs) matrix from one column gather."""
+        columns = np.searchsorted(self.freqs_hz, np.asarray(cutoffs_hz, dtype=np.float64), side="right") - 1
+        above = np.empty((len(self.total_energy), len(columns)))
+        above[:, columns >= 0] = self.energy_above[:, columns[columns >= 0]]     # last cached freq <= cutoff
+        above[:, columns < 0] = self.total_energy[:, np.newaxis]
+        ratios = np.zeros_like(above)
+        np.divide(above, self.total_energy[:, np.newaxis], out=ratios, where=self.total_energy[:, np.newaxis] > 0.0)
+        return ratios
+
+    def at_freqs(self, freqs_hz):
+        """The same cache reduced to the given frequencies (e.g. a coarse grid) by column selection."""
+        freqs_hz = np.unique(np.asarray(freqs_hz, dtype=np.float64))
+        columns = np.searchsorted(self.freqs_hz, freqs_hz, side="right") - 1
+        energy_above = np.empty((len(self.total_energy), len(freqs_hz)), dtype=np.float32)
+        energy_above[:, columns >= 0] = self.energy_above[:, columns[columns >= 0]]
+        energy_above[:, columns < 0] = self.total_energy[:, np.newaxis]
+        return CumulativeEnergyCache(freqs_hz=freqs_hz, energy_above=energy_above, total_energy=self.total_energy)
+
+def default_frame_size(samplerate):
+    # Power of two nearest the reference frame duration: 32768 at 44.1/48 kHz, 65536 at 88.2/96 kHz, 131072 at 176.4/192 kHz
+    exponent = round(math.log2(REFERENCE_FRAME_SIZE * samplerate / REFERENCE_SAMPLERATE_HZ))
+    return max(MIN_FRAME_SIZE, 1 << exponent)
+
+def frame_geometry(samplerate, frame_size=None, step=None):
+    """(frame_size, step) for a file: the given values, or default_frame_size() and a half-frame hop."""
+    frame_size = default_frame_size(samplerate) if frame_size is None else int(frame_size)
+    step = frame_size // 2 if step is None else int(step)
+    # Checked once both are resolved: a hop given alone must still fit this rate's default frame size
+    if frame_size < MIN_FRAME_SIZE or not 1 <= step <= frame_size:
+        raise ValueError(f"invalid frame geometry at {samplerate} Hz: frame size {frame_size} (at least {MIN_FRAME_SIZE}), "
+                         f"hop {step} (1 to the frame size)")
+    return frame_size, step
+
+def frame_count(num_samples, frame_size=REFERENCE_FRAME_SIZE, step=REFERENCE_FRAME_SIZE // 2):
+    # Number of full frames divide_into_frames() / stream_flac() produce for a track of num_samples
+    if num_samples < frame_size:
+        return 0
+    return 1 + (num_samples - frame_size) // step
+
+def divide_into_frames(data, frame_size=REFERENCE_FRAME_SIZE, step=REFERENCE_FRAME_SIZE // 2):
+    # Zero-copy strided view of overlapping frames: (num_frames, frame_size) or (num_frames, frame_size, channels)
+    data = np.asarray(data)
+    if len(data) < frame_size:
+        return np.empty((0, frame_size) + data.shape[1:], dtype=data.dtype)
+    windows = np.lib.stride_tricks.sliding_window_view(data, frame_size, axis=0)[::step]
+    if data.ndim > 1:
+        windows = np.moveaxis(windows, -1, 1)    # sliding_window_view puts the window axis last
+    return windows
+
+@lru_cache(maxsize=None)
+def _hann_window(frame_size):
+    window = np.hanning(frame_size).astype(np.float32)   # Like the decoded PCM: batches FFT in single precision
+    window.flags.writeable = False                       # Shared between calls; must never be modified in place
+    return window
+
+@lru_cache(maxsize=None)
+def _rfft_frequencies(frame_size, samplerate):
+    freqs = np.fft.rfftfreq(frame_size, d=1 / samplerate)
+    freqs.flags.writeable = False
+    return freqs
+
+@lru_cache(maxsize=256)
+def _first_bins_above(frame_size, samplerate, freqs_hz):
+    # Index of the first FFT bin strictly above each of freqs_hz (a tuple): the cutoff and cache-column lookups,
+    # computed once per (frame size, sample rate, frequencies) instead of once per batch
+    bins = np.searchsorted(_rfft_frequencies(frame_size, samplerate), freqs_hz, side="right")
+    bins.flags.writeable = False
+    return bins
+
+def _frame_plan(frame_size, samplerate, effective_cutoff, cache_freqs_hz):
+    """
+    Everything the batched FFT needs for one (frame_size, samplerate) pair, all from per-process caches,
+    so files of the same rate in a batch never rebuild them: (window, freqs, first_high_bin,
+    cache_freqs_hz, cache_bins), with cache_bins None when every bin is kept.
+    """
+    freqs = _rfft_frequencies(frame_size, samplerate)
+    first_high_bin = int(_first_bins_above(frame_size, samplerate, (float(effective_cutoff),))[0])
+    cache_bins = None
+    if cache_freqs_hz is not None:
+        cache_freqs_hz = np.unique(np.asarray(cache_freqs_hz, dtype=np.float64))
+        cache_bins = _first_bins_above(frame_size, samplerate, tuple(cache_freqs_hz.tolist()))
+    return _hann_window(frame_size), freqs, first_high_bin, cache_freqs_hz, cache_bins
+
+def _rfft(windowed, axis=-1):
+    # scipy.fft transforms float32 natively (numpy.fft does not), ~2.5x faster on analysis frames; the input is
+    # always a temporary. Imported on first use: fingerprint-only runs (reclassify, serve) never load scipy
+    from scipy import fft as scipy_fft
+    return scipy_fft.rfft(windowed, axis=axis, overwrite_x=True)
 
 def calculate_effective_cutoff(samplerate):
     nyquist_frequency = samplerate / 2.0
     effective_cutoff = min(CUTOFF_HZ, max(0.0, nyquist_frequency - NYQUIST_SAFETY_BAND_HZ))
     return effective_cutoff
 
-def analyze_frame(single_frame, samplerate, effective_cutoff, fft_cache_list=None):
+def analyze_frame(single_frame, samplerate, effective_cutoff):
     if single_frame.ndim > 1:
         single_frame = single_frame[:, 0]
 
-    if np.max(np.abs(single_frame)) < 1e-4:
-        if fft_cache_list is not None:
-            fft_cache_list.append(FrameFFT(np.array([]), np.array([]), 0.0))
+    if np.max(np.abs(single_frame)) < SILENCE_PEAK_THRESHOLD:
         return 0.0
 
-    windowed = single_frame * np.hanning(len(single_frame))
-    spectrum = np.abs(np.fft.rfft(windowed))
-    freqs = np.fft.rfftfreq(len(single_frame), d=1 / samplerate)
+    windowed = single_frame * _hann_window(len(single_frame))
+    spectrum = np.abs(_rfft(windowed))
+    freqs = _rfft_frequencies(len(single_frame), samplerate)
     total_energy = float(np.sum(spectrum))
 
     if total_energy <= 0.0 or not np.isfinite(total_energy):
-        if fft_cache_list is not None:
-            fft_cache_list.append(FrameFFT(freqs, spectrum, 0.0))
         return 0.0
 
-    if fft_cache_list is not None:
-        fft_cache_list.append(FrameFFT(freqs_hz=freqs, spectrum_abs=spectrum, total_energy=total_energy))
-
     high_band_energy = np.sum(spectrum[freqs > effective_cutoff])
     ratio = high_band_energy / total_energy
 
     if __debug__:
         assert np.isfinite(ratio), "Non-finite ratio produced in analyze_frame()"
 
-    return ratio
\ No newline at end of file
+    return ratio
+
+def _energy_above_columns(spectra, column_bins=None):
+    # Reverse cumulative sum, padded with a zero column, so energy strictly above any frequency is one lookup;
+    # column_bins (first bin strictly above each cached frequency) None keeps every FFT bin
+    # (column k = energy strictly above freqs[k])
+    reverse_cumulative = np.zeros((spectra.shape[0], spectra.shape[1] + 1))
+    np.cumsum(spectra[:, ::-1], axis=1, out=reverse_cumulative[:, -2::-1])
+    if column_bins is None:
+        return reverse_cumulative[:, 1:]
+    return reverse_cumulative[:, column_bins]
+
+def _analyze_batch(batch, window, first_high_bin):
+    # Same silence rule as analyze_frame(): peak amplitude below threshold => ratio 0, no FFT needed
+    audible = np.max(np.abs(batch), axis=1) >= SILENCE_PEAK_THRESHOLD
+    spectra = np.abs(_rfft(batch[audible] * window, axis=1))
+    total_energy = np.sum(spectra, axis=1, dtype=np.float64)
+    high_band_energy = np.sum(spectra[:, first_high_bin:], axis=1, dtype=np.float64)
+
+    valid = (total_energy > 0.0) & np.isfinite(total_energy)
+    total_energy[~valid] = 0.0
+    audible_ratios = np.zeros(len(spectra))
+    np.divide(high_band_energy, total_energy, out=audible_ratios, where=valid)
+
+    batch_ratios = np.zeros(len(batch))
+    batch_ratios[audible] = audible_ratios
+    return batch_ratios, audible, spectra, total_energy
+
+def analyze_frames(frames, samplerate, effective_cutoff, cache_freqs_hz=None, batch_size=FFT_BATCH_FRAMES):
+    """
+    Batched equivalent of calling analyze_frame() on every frame.
+
+    frames: (num_frames, frame_size) or (num_frames, frame_size, channels), typically the strided
+            view returned by divide_into_frames(); only the first channel is analyzed
+            (see analyze_channel_frames() for all of them).
+    cache_freqs_hz: frequencies kept in the returned cache; None keeps every FFT bin.
+    Returns (ratios, cache): a float64 array of per-frame energy-above-cutoff ratios (0.0 for
+    silent/invalid frames) and a CumulativeEnergyCache, one contiguous matrix for the whole file.
+    """
+    if frames.ndim > 2:
+        frames = frames[:, :, 0]
+    num_frames, frame_size = frames.shape
+
+    window, freqs, first_high_bin, cache_freqs_hz, cache_bins = _frame_plan(frame_size, samplerate, effective_cutoff,
+                                                                             cache_freqs_hz)
+
+    ratios = np.zeros(num_frames, dtype=np.float64)
+    num_columns = len(freqs) if cache_freqs_hz is None else len(cache_freqs_hz)
+    energy_above = np.zeros((num_frames, num_columns), dtype=np.float32)
+    total_energy = np.zeros(num_frames, dtype=np.float64)
+
+    for batch_start in range(0, num_frames, batch_size):
+        batch = frames[batch_start:batch_start + batch_size]
+        batch_ratios, audible, spectra, audible_total_energy = _analyze_batch(batch, window, first_high_bin)
+        ratios[batch_start:batch_start + len(batch)] = batch_ratios
+
+        valid = audible_total_energy > 0.0                                       # silent/invalid rows stay zero
+        cache_rows = np.flatnonzero(audible)[valid] + batch_start
+        energy_above[cache_rows] = _energy_above_columns(spectra[valid], cache_bins)
+        total_energy[cache_rows] = audible_total_energy[valid]
+
+    if __debug__:
+        assert np.all(np.isfinite(ratios)), "Non-finite ratio produced in analyze_frames()"
+
+    cache = CumulativeEnergyCache(
+        freqs_hz=freqs if cache_freqs_hz is None else cache_freqs_hz,
+        energy_above=energy_above,
+        total_energy=total_energy,
+    )
+    return ratios, cache
+
+def channel_labels(num_channels, mid_side=False):
+    """Names of the analyze_channel_frames() outputs: L/R (+ M/S) for stereo, ch1..chN otherwise."""
+    if num_channels == 2:
+        return ["L", "R", "M", "S"] if mid_side else ["L", "R"]
+    return [f"ch{i + 1}" for i in range(num_channels)]
+
+def analyze_channel_frames(frames, samplerate, effective_cutoff, mid_side=False, cache_freqs_hz=None, batch_size=FFT_BATCH_FRAMES):
+    """
+    analyze_frames() for every channel instead of only the first: returns one (ratios, cache) pair per
+    channel_labels() entry.
+
+    All channels of a batch are windowed and transformed by one 2-D rFFT. With mid_side (stereo only),
+    mid = (L + R) / 2 and side = (L - R) / 2 are derived from the complex L/R spectra, which the rFFT's
+    linearity makes exact, so they cost no further FFTs. Silence is judged per channel (and on the
+    mid/side signals), as in analyze_frame(); frames silent in every output are not transformed at all.
+    """
+    if frames.ndim == 2:
+        frames = frames[:, :, np.newaxis]
+    num_frames, frame_size, num_channels = frames.shape
+    mid_side = mid_side and num_channels == 2
+    num_outputs = num_channels + (2 if mid_side else 0)
+
+    window, freqs, first_high_bin, cache_freqs_hz, cache_bins = _frame_plan(frame_size, samplerate, effective_cutoff,
+                                                                             cache_freqs_hz)
+    window = window[:, np.newaxis]
+
+    ratios = np.zeros((num_outputs, num_frames), dtype=np.float64)
+    num_columns = len(freqs) if cache_freqs_hz is None else len(cache_freqs_hz)
+    energy_above = np.zeros((num_outputs, num_frames, num_columns), dtype=np.float32)
+    total_energy = np.zeros((num_outputs, num_frames), dtype=np.float64)
+
+    for batch_start in range(0, num_frames, batch_size):
+        batch = frames[batch_start:batch_start + batch_size]                     # (batch, frame_size, channels)
+        peaks = np.max(np.abs(batch), axis=1)
+        if mid_side:
+            peaks = np.concatenate([peaks, np.stack([np.max(np.abs(batch[:, :, 0] + batch[:, :, 1]), axis=1) / 2,
+                                                     np.max(np.abs(batch[:, :, 0] - batch[:, :, 1]), axis=1) / 2], axis=1)], axis=1)
+        audible = peaks >= SILENCE_PEAK_THRESHOLD                                 # (batch, outputs)
+        transformed = np.flatnonzero(audible.any(axis=1))
+        if len(transformed) == 0:
+            continue
+
+        spectra = _rfft(batch[transformed] * window, axis=1)                     # (n, bins, channels), one call
+        if mid_side:
+            spectra = np.concatenate([spectra, (spectra[:, :, :1] + spectra[:, :, 1:]) / 2,
+                                      (spectra[:, :, :1] - spectra[:, :, 1:]) / 2], axis=2)
+        spectra = np.abs(spectra)
+
+        for output in range(num_outputs):
+            magnitudes = spectra[:, :, output]
+            output_total = np.sum(magnitudes, axis=1, dtype=np.float64)
+            valid = audible[transformed, output] & (output_total > 0.0) & np.isfinite(output_total)
+            rows = transformed[valid] + batch_start
+            ratios[output, rows] = np.sum(magnitudes[valid, first_high_bin:], axis=1, dtype=np.float64) / output_total[valid]
+            energy_above[output, rows] = _energy_above_columns(magnitudes[valid], cache_bins)
+            total_energy[output, rows] = output_total[valid]
+
+    if __debug__:
+        assert np.all(np.isfinite(ratios)), "Non-finite ratio produced in analyze_channel_frames()"
+
+    cache_freqs = freqs if cache_freqs_hz is None else cache_freqs_hz
+    return [
+        (ratios[output], CumulativeEnergyCache(freqs_hz=cache_freqs, energy_above=energy_above[output],
+                                               total_energy=total_energy[output]))
+        for output in range(num_outputs)
+    ]
+
+class StreamingFrameAnalyzer:
+    """
+    Incremental analyze_frames(): frames are fed one at a time (e.g. straight from the decoder) and
+    analyzed in batches, keeping only per-frame ratios plus a CumulativeEnergyCache at `cache_freqs_hz`.
+    Memory is bounded by one batch of frames plus that small cache, independent of track length.
+    """
+
+    def __init__(self, samplerate, effective_cutoff, frame_size, cache_freqs_hz=(), batch_size=FFT_BATCH_FRAMES):
+        self.samplerate = samplerate
+        self.effective_cutoff = effective_cutoff
+        self.cache_freqs_hz = cache_freqs_hz
+        self.batch = np.empty((batch_size, frame_size), dtype=np.float32)
+        self.batch_fill = 0
+        self.ratio_chunks = []
+        self.cache_chunks = []
+
+    def feed(self, frame):
+        if frame.ndim > 1:
+            frame = frame[:, 0]
+        self.batch[self.batch_fill] = frame
+        self.batch_fill += 1
+        if self.batch_fill == len(self.batch):
+            self._flush()
+
+    def _flush(self):
+        if self.batch_fill == 0:
+            return
+        batch_ratios, batch_cache = analyze_frames(
+            self.batch[:self.batch_fill], self.samplerate, self.effective_cutoff, self.cache_freqs_hz
+        )
+        self.ratio_chunks.append(batch_ratios)
+        self.cache_chunks.append(batch_cache)
+        self.batch_fill = 0
+
+    def finish(self):
+        """Analyze any buffered frames; returns (ratios, CumulativeEnergyCache)."""
+        self._flush()
+        if not self.cache_chunks:
+            return analyze_frames(self.batch[:0], self.samplerate, self.effective_cutoff, self.cache_freqs_hz)
+        ratios = np.concatenate(self.ratio_chunks)
+        cache = CumulativeEnergyCache(
+            freqs_hz=self.cache_chunks[0].freqs_hz,
+            energy_above=np.concatenate([c.energy_above for c in self.cache_chunks]),
+            total_energy=np.concatenate([c.total_energy for c in self.cache_chunks]),
+        )
+        return ratios, cache
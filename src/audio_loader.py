@@ -2,19 +2,115 @@
 import numpy as np
 import soundfile as sf
 
-def load_flac(file_path):
+LOAD_BLOCK_FRAMES: int = 1 << 18         # Frames decoded per block when only some channels are kept (~1 MB per channel)
+
+SUBTYPE_BIT_DEPTHS = {"PCM_S8": 8, "PCM_U8": 8, "PCM_16": 16, "PCM_24": 24, "PCM_32": 32, "FLOAT": 32, "DOUBLE": 64}
+
+def _is_integer_pcm(subtype):
+    # Integer samples (every FLAC stream) cannot be NaN/inf, so they never need the finiteness pass
+    return subtype.startswith("PCM_")
+
+def _read_channels(sound_file, channels):
+    # Decode block by block, keeping only the wanted channels, so the full-width array never exists
+    data = np.empty((sound_file.frames, len(channels)), dtype=np.float32)
+    block = np.empty((max(1, min(LOAD_BLOCK_FRAMES, sound_file.frames)), sound_file.channels), dtype=np.float32)
+    position = 0
+    while position < len(data):
+        decoded = sound_file.read(dtype="float32", always_2d=True, out=block)
+        if len(decoded) == 0:
+            break
+        data[position:position + len(decoded)] = decoded[:, channels]
+        position += len(decoded)
+    return data[:position]
+
+def load_flac(file_path, channels=None):
+    # Decodes straight to float32 (libsndfile scales the integer samples itself: no float64 intermediate).
+    # channels: indices to keep (e.g. [0]), selected while decoding; None keeps all.
+    # A single kept channel comes back 1-D, like a mono file.
     try:
-        data, samplerate = sf.read(file_path, always_2d=False)
-        data = np.asarray(data)                    # Ensure numpy array is used
-
-        if data.dtype.kind != "f":
-            data = data.astype(np.float32)         # Convert to float32
-        else:
-            data = data.astype(np.float32, copy=False)
-        if not np.all(np.isfinite(data)):          # If any non-finite samples exist, replace them with 0.0
+        with sf.SoundFile(file_path) as sound_file:
+            samplerate = sound_file.samplerate
+            channels = list(range(sound_file.channels)) if channels is None else list(channels)
+            if channels == list(range(sound_file.channels)):
+                data = sound_file.read(dtype="float32", always_2d=True)
+            else:
+                data = _read_channels(sound_file, channels)
+            integer_pcm = _is_integer_pcm(sound_file.subtype)
+        if data.shape[1] == 1:
+            data = data[:, 0]
+
+        if not integer_pcm and not np.all(np.isfinite(data)):   # Float sources only: replace non-finite samples with 0.0
             data = np.nan_to_num(data, nan=0.0, posinf=0.0, neginf=0.0)
         return data, samplerate
 
     except Exception as e:
         print(f"Error loading file: {e}")
         return None, None
+
+def flac_format_info(file_path):
+    """Returns (subtype, bit_depth) from the header, e.g. ("PCM_24", 24), or ("", None) if unreadable."""
+    try:
+        subtype = sf.info(file_path).subtype
+    except Exception:
+        return "", None
+    return subtype, SUBTYPE_BIT_DEPTHS.get(subtype)
+
+def _iter_flac_frames(file_path, frame_size, step):
+    with sf.SoundFile(file_path) as sound_file:
+        integer_pcm = _is_integer_pcm(sound_file.subtype)
+        # Each block is one analysis frame; overlap re-reads the shared part so memory stays at one frame
+        for block in sound_file.blocks(blocksize=frame_size, overlap=frame_size - step, dtype="float32", always_2d=True):
+            if len(block) < frame_size:
+                break                                  # Same as divide_into_frames(): drop the partial tail
+            if not integer_pcm and not np.all(np.isfinite(block)):
+                block = np.nan_to_num(block, nan=0.0, posinf=0.0, neginf=0.0)
+            yield block
+
+def stream_flac(file_path, frame_size=32768, step=16384):
+    """
+    Streaming counterpart of load_flac(): returns (frames, samplerate, num_samples), where frames is a
+    generator of float32 (frame_size, channels) blocks decoded on demand with `step` samples between
+    frame starts. Only one frame is decoded and held at a time, regardless of track length.
+    """
+    if not 1 <= step <= frame_size:
+        # A hop past the frame would be a negative block overlap, which soundfile silently misreads
+        raise ValueError(f"step must be between 1 and frame_size ({frame_size}), got {step}")
+    try:
+        info = sf.info(file_path)
+        return _iter_flac_frames(file_path, frame_size, step), info.samplerate, info.frames
+
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        return None, None, None
+
+def flac_stream_info(file_path):
+    """Returns (samplerate, num_samples) from the header alone, or (None, None) if unreadable."""
+    try:
+        info = sf.info(file_path)
+        return info.samplerate, info.frames
+
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        return None, None
+
+def read_flac_frames_at(file_path, frame_indices, frame_size=32768, step=16384):
+    """
+    Decode only the given analysis frames (frame i starts at sample i * step) by seeking, instead of
+    the whole track. Returns a float32 (len(frame_indices), frame_size, channels) array in the order
+    given, or None if the file cannot be read. Indices past the last full frame are not allowed.
+    """
+    try:
+        with sf.SoundFile(file_path) as sound_file:
+            integer_pcm = _is_integer_pcm(sound_file.subtype)
+            frames = np.empty((len(frame_indices), frame_size, sound_file.channels), dtype=np.float32)
+            for row, frame_index in enumerate(frame_indices):
+                sound_file.seek(int(frame_index) * step)
+                if sound_file.read(frame_size, dtype="float32", always_2d=True, out=frames[row]).shape[0] < frame_size:
+                    raise ValueError(f"frame {frame_index} extends past the end of the file")
+        if not integer_pcm and not np.all(np.isfinite(frames)):
+            frames = np.nan_to_num(frames, nan=0.0, posinf=0.0, neginf=0.0)
+        return frames
+
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        return None
@@ -0,0 +1,250 @@
+# batch_executors.py
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+MAX_ATTEMPTS_AFTER_CRASH: int = 2        # A file that takes down its worker this many times is reported, not retried
+POLL_INTERVAL_S: float = 0.5             # How often hung tasks are checked for when a timeout is set
+THREAD_TASKS_PER_WORKER: int = 2         # Queued tasks per thread, so a thread never waits on the main loop
+PIPELINE_READ_WORKERS: int = 2           # Threads reading raw file bytes; reads are latency-bound
+PIPELINE_READ_AHEAD_FILES: int = 8       # Files read/decoded ahead of the analysis stage
+PIPELINE_READ_AHEAD_BYTES: int = 512 * 1024 * 1024   # Raw + decoded buffers held by read-ahead, across all files
+
+def default_job_count() -> int:
+    count = getattr(os, "process_cpu_count", os.cpu_count)()   # process_cpu_count respects CPU affinity (3.13+)
+    return max(1, count or 1)
+
+def gil_enabled() -> bool:
+    # Free-threaded builds (3.13t/3.14t) report False once the GIL is actually disabled at runtime;
+    # sys._is_gil_enabled() does not exist on older or regular builds, which always have a GIL.
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    if is_gil_enabled is None:
+        return True
+    return bool(is_gil_enabled())
+
+def _error_result(file_path: str, status: str) -> Dict[str, Any]:
+    return {"path": file_path, "status": status}
+
+def _kill_workers(executor: ProcessPoolExecutor) -> None:
+    # Python 3.14+ can kill workers directly; older versions need the private process table
+    kill_workers = getattr(executor, "kill_workers", None)
+    if kill_workers is not None:
+        kill_workers()
+        return
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_process_pool_results(
+    file_paths: Iterable[str],
+    task: Callable[[str], Dict[str, Any]],
+    jobs: int,
+    task_timeout_s: Optional[float] = None,
+    max_tasks_per_worker: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run task(file_path) in a pool of worker processes and yield result dicts in completion order.
+
+    - At most `jobs` tasks are in flight, so a task starts (almost) as soon as it is submitted;
+      this is what makes `task_timeout_s` measurable from the submit time.
+    - A task that exceeds `task_timeout_s` is reported as "ERROR (timeout)"; the pool is then killed
+      and rebuilt, and the other in-flight files are resubmitted.
+    - A crashed worker (segfault, OOM kill) breaks the whole pool: in-flight files are resubmitted to a
+      fresh pool, one at a time, and only reported as "ERROR (worker crashed)" after
+      MAX_ATTEMPTS_AFTER_CRASH crashes.
+    - `max_tasks_per_worker` recycles each worker process after that many files, releasing any memory
+      the decoder accumulated.
+    """
+    pending = iter(file_paths)
+    retry_queue = []
+    crash_counts: Dict[str, int] = {}
+    in_flight = {}                                   # future -> (file_path, submitted_at)
+
+    def new_executor() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=max_tasks_per_worker)
+
+    def next_path() -> Optional[str]:
+        if retry_queue:
+            return retry_queue.pop()
+        return next(pending, None)
+
+    executor = new_executor()
+    isolating = False
+    try:
+        while True:
+            while len(in_flight) < jobs and not isolating:
+                file_path = next_path()
+                if file_path is None:
+                    break
+                if crash_counts.get(file_path):
+                    # Crash suspects rerun alone, so a second crash is attributable to exactly one file
+                    if in_flight:
+                        retry_queue.append(file_path)
+                        break
+                    isolating = True
+                try:
+                    in_flight[executor.submit(task, file_path)] = (file_path, time.monotonic())
+                except BrokenProcessPool:
+                    # Broke before any result told us; requeue everything in flight and start over
+                    retry_queue.append(file_path)
+                    retry_queue.extend(path for path, _ in in_flight.values())
+                    in_flight.clear()
+                    _kill_workers(executor)
+                    executor = new_executor()
+
+            if not in_flight:
+                return
+
+            wait_timeout = POLL_INTERVAL_S if task_timeout_s is not None else None
+            done, _ = wait(in_flight, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            pool_broken = False
+            for future in done:
+                file_path, _ = in_flight.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    pool_broken = True
+                    crash_counts[file_path] = crash_counts.get(file_path, 0) + 1
+                    if crash_counts[file_path] >= MAX_ATTEMPTS_AFTER_CRASH:
+                        yield _error_result(file_path, "ERROR (worker crashed)")
+                    else:
+                        retry_queue.append(file_path)
+                except Exception:
+                    yield _error_result(file_path, "ERROR")
+
+            timed_out = []
+            if task_timeout_s is not None:
+                now = time.monotonic()
+                timed_out = [f for f, (_, submitted_at) in in_flight.items() if now - submitted_at > task_timeout_s]
+                for future in timed_out:
+                    file_path, _ = in_flight.pop(future)
+                    yield _error_result(file_path, "ERROR (timeout)")
+
+            if pool_broken or timed_out:
+                # The pool cannot be reused: requeue the innocent in-flight files and start over
+                retry_queue.extend(file_path for file_path, _ in in_flight.values())
+                in_flight.clear()
+                _kill_workers(executor)
+                executor = new_executor()
+            isolating = any(crash_counts.get(file_path) for file_path, _ in in_flight.values())
+    finally:
+        if in_flight:
+            _kill_workers(executor)                  # Interrupted (Ctrl-C / consumer stopped): don't wait for workers
+        else:
+            executor.shutdown(wait=True)
+
+def iter_thread_pool_results(
+    file_paths: Iterable[str],
+    task: Callable[[str], Dict[str, Any]],
+    jobs: int,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run task(file_path) in a pool of threads and yield result dicts in completion order.
+
+    Intended for free-threaded builds, where decoding and the NumPy FFT work run truly in parallel
+    with no pickling or process start-up cost. Threads cannot be killed, so there is no per-task
+    timeout or worker recycling here; a failing task is still reported as an "ERROR" row.
+    """
+    pending = iter(file_paths)
+    in_flight = {}                                   # future -> file_path
+
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="flac-scan") as executor:
+        try:
+            while True:
+                while len(in_flight) < jobs * THREAD_TASKS_PER_WORKER:
+                    file_path = next(pending, None)
+                    if file_path is None:
+                        break
+                    in_flight[executor.submit(task, file_path)] = file_path
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = in_flight.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception:
+                        yield _error_result(file_path, "ERROR")
+        finally:
+            for future in in_flight:
+                future.cancel()                      # Interrupted: drop queued work, let running tasks finish
+
+def _payload_nbytes(payload: Any) -> int:
+    # Memory held by a stage's output: raw bytes, arrays, or tuples of them
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return len(payload)
+    if isinstance(payload, tuple):
+        return sum(_payload_nbytes(part) for part in payload)
+    return int(getattr(payload, "nbytes", 0))
+
+def iter_pipelined_results(
+    file_paths: Iterable[str],
+    read: Callable[[str], Any],
+    decode: Callable[[str, Any], Any],
+    analyze: Callable[[str, Any], Dict[str, Any]],
+    read_workers: int,
+    decode_workers: int,
+    analyze_workers: int,
+    read_ahead_files: int = PIPELINE_READ_AHEAD_FILES,
+    read_ahead_bytes: int = PIPELINE_READ_AHEAD_BYTES,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run each file through three stages, each on its own thread pool, and yield result dicts in
+    completion order: read(path) -> raw, decode(path, raw) -> decoded, analyze(path, decoded) -> result.
+
+    Storage latency, decoding and analysis of different files overlap: while one file is analyzed the
+    next ones are already being decoded and read. Threads suffice on regular builds too, since file
+    reads, libsndfile decoding and the NumPy FFT all release the GIL.
+
+    Read-ahead is bounded twice: at most `read_ahead_files` files beyond those being analyzed are in
+    the pipeline, and a new read only starts while the raw + decoded buffers held stay under
+    `read_ahead_bytes` (one file is always admitted, so a file larger than the budget still runs).
+    `file_paths` is consumed lazily, on the calling thread. A stage that raises yields an "ERROR" row.
+    """
+    pending = iter(file_paths)
+    in_flight = {}                                   # future -> (stage, file_path, bytes held)
+    held_bytes = 0
+    max_in_flight = analyze_workers + read_ahead_files
+
+    with ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="flac-read") as readers, \
+         ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="flac-decode") as decoders, \
+         ThreadPoolExecutor(max_workers=analyze_workers, thread_name_prefix="flac-analyze") as analyzers:
+        try:
+            while True:
+                while len(in_flight) < max_in_flight and (not in_flight or held_bytes < read_ahead_bytes):
+                    file_path = next(pending, None)
+                    if file_path is None:
+                        break
+                    in_flight[readers.submit(read, file_path)] = ("read", file_path, 0)
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, file_path, nbytes = in_flight.pop(future)
+                    held_bytes -= nbytes
+                    try:
+                        output = future.result()
+                    except Exception:
+                        yield _error_result(file_path, "ERROR")
+                        continue
+                    if stage == "analyze":
+                        yield output
+                        continue
+                    nbytes = _payload_nbytes(output)
+                    held_bytes += nbytes
+                    if stage == "read":
+                        in_flight[decoders.submit(decode, file_path, output)] = ("decode", file_path, nbytes)
+                    else:
+                        in_flight[analyzers.submit(analyze, file_path, output)] = ("analyze", file_path, nbytes)
+        finally:
+            for future in in_flight:
+                future.cancel()                      # Interrupted: drop queued work, let running tasks finish
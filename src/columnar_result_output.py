@@ -0,0 +1,181 @@
+# columnar_result_output.py
+import os
+import threading
+
+import numpy as np
+
+from typing import Any, Dict, Iterable, Optional
+
+from file_status_determination import PROBE_CUTOFFS_HZ
+
+COLUMNAR_ROWS_PER_GROUP: int = 4096      # Parquet row-group size; rows are written out in groups, not held to the end
+
+STRING_COLUMNS = [
+    "path",
+    "status",
+    "sample_format",
+    "channel_mode",
+    "per_channel_status",
+    "per_channel_estimated_cutoff_hz",
+    "per_channel_active_fraction",
+]
+FLOAT_COLUMNS = ["confidence", "elapsed_s", "effective_cutoff_hz", "estimated_cutoff_hz"]
+INT_COLUMNS = [
+    "samplerate_hz",
+    "bit_depth",
+    "num_samples",
+    "num_total_frames",
+    "num_analyzed_frames",
+    "num_non-silent_frames",
+    "nearest_profile_kbps",
+]
+FRACTION_COLUMNS = {cutoff: f"active_fraction_{int(cutoff)}" for cutoff in PROBE_CUTOFFS_HZ}
+
+def _pyarrow_parquet():
+    # Optional dependency: Parquet output only when pyarrow is installed, NPZ otherwise
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None, None
+    return pyarrow, pyarrow.parquet
+
+def resolve_columnar_format(output_format: str) -> str:
+    if output_format == "auto":
+        pyarrow, _ = _pyarrow_parquet()
+        return "parquet" if pyarrow is not None else "npz"
+    return output_format
+
+def _parse_fractions(packed: str) -> Dict[float, float]:
+    # Inverse of run_modes._format_fractions_for_csv(), for results that only carry the CSV string (e.g. from --db)
+    fractions = {}
+    for item in str(packed or "").split(";"):
+        cutoff, _, fraction = item.partition("=")
+        if fraction:
+            fractions[float(cutoff)] = float(fraction)
+    return fractions
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")                          # "" for errors / not estimated
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class ColumnarResultSink:
+    """
+    Typed, columnar counterpart of the result CSV, for analytics: one column per scalar result field,
+    the per-cutoff active fractions as numeric columns (active_fraction_<cutoff>, NaN where not
+    computed), any extra_float_columns (e.g. the per-stage timings) and, optionally, each file's
+    per-frame ratio vector.
+
+    - Parquet (needs pyarrow): frame ratios are a list<float32> column; rows are written in row groups
+      of COLUMNAR_ROWS_PER_GROUP, so memory stays bounded.
+    - NPZ (no extra dependency): one array per column, missing integers stored as -1, and the ragged
+      frame ratios as one flat float32 `frame_ratios` array plus `frame_ratio_offsets` (row i is
+      frame_ratios[offsets[i]:offsets[i + 1]]). Rows are held until close(), then written atomically.
+    """
+
+    def __init__(self, base_path: str, output_format: str = "auto", include_frame_ratios: bool = False,
+                 extra_float_columns: Iterable[str] = ()) -> None:
+        self.output_format = resolve_columnar_format(output_format)
+        self.path = base_path + "." + self.output_format
+        self.include_frame_ratios = include_frame_ratios
+        self.float_columns = FLOAT_COLUMNS + [c for c in extra_float_columns if c not in FLOAT_COLUMNS]
+        self.lock = threading.Lock()
+        self.columns = self._empty_columns()
+        self.parquet_writer = None
+
+        parent_dir = os.path.dirname(os.path.abspath(self.path))
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+
+    def _empty_columns(self) -> Dict[str, list]:
+        names = STRING_COLUMNS + self.float_columns + INT_COLUMNS + list(FRACTION_COLUMNS.values())
+        if self.include_frame_ratios:
+            names.append("frame_ratios")
+        return {name: [] for name in names}
+
+    def write(self, result: Dict[str, Any]) -> None:
+        fractions = result.get("per_cutoff_fractions")
+        if fractions is None:
+            fractions = _parse_fractions(result.get("per_cutoff_active_fraction", ""))
+
+        with self.lock:
+            for name in STRING_COLUMNS:
+                self.columns[name].append(str(result.get(name, "")))
+            for name in self.float_columns:
+                self.columns[name].append(_as_float(result.get(name)))
+            for name in INT_COLUMNS:
+                self.columns[name].append(_as_int(result.get(name)))
+            for cutoff, name in FRACTION_COLUMNS.items():
+                self.columns[name].append(_as_float(fractions.get(cutoff)))
+            if self.include_frame_ratios:
+                ratios = result.get("frame_ratios")
+                self.columns["frame_ratios"].append(np.asarray([] if ratios is None else ratios, dtype=np.float32))
+
+            if self.output_format == "parquet" and len(self.columns["path"]) >= COLUMNAR_ROWS_PER_GROUP:
+                self._write_row_group()
+
+    def _write_row_group(self) -> None:
+        if not self.columns["path"]:
+            return
+        pyarrow, parquet = _pyarrow_parquet()
+        arrays = {}
+        for name, values in self.columns.items():
+            if name in STRING_COLUMNS:
+                arrays[name] = pyarrow.array(values, type=pyarrow.string())
+            elif name in INT_COLUMNS:
+                arrays[name] = pyarrow.array(values, type=pyarrow.int64())
+            elif name == "frame_ratios":
+                offsets = np.concatenate([[0], np.cumsum([len(r) for r in values])]).astype(np.int32)
+                arrays[name] = pyarrow.ListArray.from_arrays(offsets, pyarrow.array(np.concatenate(values), type=pyarrow.float32()))
+            else:
+                arrays[name] = pyarrow.array(values, type=pyarrow.float64())
+        table = pyarrow.table(arrays)
+        if self.parquet_writer is None:
+            self.parquet_writer = parquet.ParquetWriter(self.path, table.schema)
+        self.parquet_writer.write_table(table)
+        self.columns = self._empty_columns()
+
+    def _write_npz(self) -> None:
+        arrays = {}
+        for name, values in self.columns.items():
+            if name in STRING_COLUMNS:
+                arrays[name] = np.asarray(values, dtype=np.str_)
+            elif name in INT_COLUMNS:
+                arrays[name] = np.asarray([-1 if v is None else v for v in values], dtype=np.int64)
+            elif name == "frame_ratios":
+                lengths = [len(r) for r in values]
+                arrays["frame_ratio_offsets"] = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+                arrays["frame_ratios"] = np.concatenate(values) if values else np.empty(0, dtype=np.float32)
+            else:
+                arrays[name] = np.asarray(values, dtype=np.float64)
+        tmp_path = self.path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.columns is None:
+                return
+            if self.output_format == "parquet":
+                self._write_row_group()
+                if self.parquet_writer is not None:
+                    self.parquet_writer.close()
+                    self.parquet_writer = None
+            else:
+                self._write_npz()
+            self.columns = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,33 +1,36 @@
 # data_and_error_logging.py
 import csv
 import os
+import threading
+import time
 from typing import Any, Dict, Iterable
 
+CSV_FLUSH_EVERY_ROWS: int = 256         # Buffered rows written out together...
+CSV_FLUSH_EVERY_S: float = 5.0          # ...or after this long, so a slow scan's CSV still fills up steadily
+
 RESULT_FIELDNAMES = [
     "path",
     "status",
     "confidence",
     "elapsed_s",
     "samplerate_hz",
+    "sample_format",
+    "bit_depth",
     "num_samples",
     "num_total_frames",
+    "num_analyzed_frames",
     "num_non-silent_frames",
     "effective_cutoff_hz",
     "per_cutoff_active_fraction",
+    "estimated_cutoff_hz",
+    "nearest_profile_kbps",
+    "channel_mode",
+    "per_channel_status",
+    "per_channel_estimated_cutoff_hz",
+    "per_channel_active_fraction",
 ]
 
-def append_result_to_csv(
-    csv_path: str,
-    result: Dict[str, Any],
-    fieldnames: Iterable[str] = RESULT_FIELDNAMES,
-) -> None:
-    # Create parent dir only if a directory is actually present in the path
-    parent_dir = os.path.dirname(os.path.abspath(csv_path))
-    if parent_dir:
-        os.makedirs(parent_dir, exist_ok=True)
-
-    file_exists = os.path.isfile(csv_path)
-
+def format_result_row(result: Dict[str, Any], fieldnames: Iterable[str] = RESULT_FIELDNAMES) -> Dict[str, Any]:
     # Build a stable, flat row
     row = {k: result.get(k, "") for k in fieldnames}
 
@@ -39,6 +42,20 @@ def append_result_to_csv(
     elapsed = row.get("elapsed_s")
     if isinstance(elapsed, (float, int)):
         row["elapsed_s"] = f"{float(elapsed):.6f}"
+    return row
+
+def append_result_to_csv(
+    csv_path: str,
+    result: Dict[str, Any],
+    fieldnames: Iterable[str] = RESULT_FIELDNAMES,
+) -> None:
+    # Create parent dir only if a directory is actually present in the path
+    parent_dir = os.path.dirname(os.path.abspath(csv_path))
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+
+    file_exists = os.path.isfile(csv_path)
+    row = format_result_row(result, fieldnames)
 
     with open(csv_path, "a", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(
@@ -50,3 +67,70 @@ def append_result_to_csv(
         if not file_exists:
             writer.writeheader()
         writer.writerow(row)
+
+class CsvResultSink:
+    """
+    Long-lived CSV writer for many results: the file is opened once, the header written once (only
+    if the file is new or empty), and rows buffered and written out every CSV_FLUSH_EVERY_ROWS rows or
+    CSV_FLUSH_EVERY_S seconds. write() may be called from several threads. Use it as a context
+    manager so buffered rows are flushed even when the run is interrupted (Ctrl-C).
+    """
+
+    def __init__(
+        self,
+        csv_path: str,
+        fieldnames: Iterable[str] = RESULT_FIELDNAMES,
+        flush_every_rows: int = CSV_FLUSH_EVERY_ROWS,
+        flush_every_s: float = CSV_FLUSH_EVERY_S,
+    ) -> None:
+        parent_dir = os.path.dirname(os.path.abspath(csv_path))
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+
+        self.fieldnames = list(fieldnames)
+        self.flush_every_rows = flush_every_rows
+        self.flush_every_s = flush_every_s
+        self.pending_rows = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.file = open(csv_path, "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(
+            self.file,
+            fieldnames=self.fieldnames,
+            extrasaction="ignore",
+            quoting=csv.QUOTE_MINIMAL,
+        )
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, result: Dict[str, Any]) -> None:
+        row = format_result_row(result, self.fieldnames)
+        with self.lock:
+            self.pending_rows.append(row)
+            if (len(self.pending_rows) >= self.flush_every_rows
+                    or time.monotonic() - self.last_flush >= self.flush_every_s):
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self.writer.writerows(self.pending_rows)
+        self.pending_rows.clear()
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush_locked()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
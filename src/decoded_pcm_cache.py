@@ -0,0 +1,97 @@
+# decoded_pcm_cache.py
+import hashlib
+import os
+
+import numpy as np
+import soundfile as sf
+
+from audio_loader import load_flac
+
+PCM_CACHE_MAX_BYTES: int = 4 * 1024 * 1024 * 1024   # Scratch space budget; least recently used entries go first
+PCM_CACHE_SUFFIX: str = ".npy"
+
+class DecodedPcmCache:
+    """
+    Scratch directory of decoded float32 PCM, one uncompressed .npy per source file (all channels), so
+    later passes over the same file (another run, other channels, another frame size, a spectrogram
+    re-analysis) np.memmap the samples instead of decoding the FLAC again:
+
+        pcm_cache = DecodedPcmCache(cache_dir)
+        data, samplerate = pcm_cache.load_flac(file_path, channels=[0])    # same contract as audio_loader.load_flac
+
+    Entries are keyed by absolute path, size and mtime, so an edited file simply misses; stale entries
+    age out with the rest. Hits are refreshed (mtime), and after every store the least recently used
+    entries are deleted until the directory fits in max_bytes. Only the two settings are stored on the
+    instance, so it pickles cheaply into pool workers, which may share one directory: writes are atomic.
+    """
+
+    def __init__(self, cache_dir, max_bytes=PCM_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def entry_path(self, file_path):
+        stat = os.stat(file_path)
+        identity = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        return os.path.join(self.cache_dir, hashlib.sha1(identity.encode("utf-8")).hexdigest() + PCM_CACHE_SUFFIX)
+
+    def load_flac(self, file_path, channels=None):
+        try:
+            path = self.entry_path(file_path)
+            samplerate = sf.info(file_path).samplerate        # Header only
+        except Exception as e:
+            print(f"Error loading file: {e}")
+            return None, None
+
+        try:
+            data = np.load(path, mmap_mode="r")                # Zero decode, zero copy: pages come from the scratch file
+            os.utime(path)                                     # Most recently used
+        except (OSError, ValueError):
+            data, samplerate = load_flac(file_path)
+            if data is None:
+                return None, None
+            self._store(path, data)
+        return _select_channels(data, channels), samplerate
+
+    def _store(self, path, data):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + f".{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp_path, path)                         # Atomic, so concurrent readers never map a half-written file
+        except OSError as e:
+            print(f"Warning: could not write the PCM cache entry '{path}': {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        # Least recently used first; another process may be evicting the same entries, so misses are fine
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith(PCM_CACHE_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)                                # Open memmaps keep their pages (POSIX)
+            except OSError:
+                pass
+            total_bytes -= size
+
+def _select_channels(data, channels):
+    # Views where possible: all channels, or a single one (1-D, like load_flac)
+    if channels is None or data.ndim == 1:
+        return data
+    channels = list(channels)
+    if len(channels) == 1:
+        return data[:, channels[0]]
+    if channels == list(range(data.shape[1])):
+        return data
+    return data[:, channels]
@@ -0,0 +1,149 @@
+# file_discovery.py
+import fnmatch
+import os
+import queue
+import threading
+
+from typing import Iterable, Iterator, Optional
+
+DISCOVERY_WORKERS: int = 8               # Directory-listing threads; listing is latency-bound (NAS), not CPU-bound
+DISCOVERY_QUEUE_SIZE: int = 4096         # Discovered paths buffered ahead of the analyzer (back-pressure beyond this)
+FLAC_SUFFIX: str = ".flac"
+
+_DONE = object()                         # End-of-discovery marker in the path queue
+
+def _matches_any(relative_path: str, patterns: Iterable[str]) -> bool:
+    # Case-insensitive, like the ".flac" suffix check; a pattern may match the relative path or just the name
+    relative_path = relative_path.replace(os.sep, "/").lower()
+    name = relative_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatchcase(relative_path, p.lower()) or fnmatch.fnmatchcase(name, p.lower()) for p in patterns)
+
+class FileDiscovery:
+    """
+    Concurrent, os.scandir-based replacement for walking a tree with os.walk before any work starts.
+
+    Iterating yields .flac paths (in no particular order) as soon as worker threads find them, through a
+    bounded queue, so analysis overlaps discovery. `num_discovered` grows while discovery runs and
+    `finished` turns True once the whole tree has been listed, for progress reporting.
+
+    - include_globs: if given, only files matching one of them are yielded.
+    - exclude_globs: matching files are skipped and matching directories are not descended into.
+      Globs are matched case-insensitively against the path relative to root and against the bare name.
+    - Directories are recorded by (st_dev, st_ino), so symlink / junction loops (with
+      follow_symlinks=True) or bind mounts never list the same directory twice.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        include_globs: Iterable[str] = (),
+        exclude_globs: Iterable[str] = (),
+        follow_symlinks: bool = False,
+        workers: int = DISCOVERY_WORKERS,
+        queue_size: int = DISCOVERY_QUEUE_SIZE,
+    ) -> None:
+        self.root = root
+        self.include_globs = list(include_globs)
+        self.exclude_globs = list(exclude_globs)
+        self.follow_symlinks = follow_symlinks
+        self.workers = workers
+        self.paths: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.directories: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.visited = set()
+        self.pending_directories = 0
+        self.num_discovered = 0
+        self.finished = False
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def _directory_key(self, path: str, entry: Optional[os.DirEntry] = None):
+        stat = entry.stat(follow_symlinks=True) if entry is not None else os.stat(path)
+        if stat.st_ino == 0:
+            stat = os.stat(path)                     # DirEntry.stat() leaves st_ino/st_dev zero on Windows
+        return stat.st_dev, stat.st_ino
+
+    def _enqueue_directory(self, path: str, entry: Optional[os.DirEntry] = None) -> None:
+        try:
+            key = self._directory_key(path, entry)
+        except OSError:
+            return
+        with self.lock:
+            if key in self.visited:
+                return
+            self.visited.add(key)
+            self.pending_directories += 1
+        self.directories.put(path)
+
+    def _put_path(self, path) -> bool:
+        # Blocks while the analyzer is behind; gives up once the consumer has stopped
+        while not self.stopped.is_set():
+            try:
+                self.paths.put(path, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _list_directory(self, directory: str) -> None:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    relative_path = os.path.relpath(entry.path, self.root)
+                    if self.exclude_globs and _matches_any(relative_path, self.exclude_globs):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                            self._enqueue_directory(entry.path, entry)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    if not entry.name.lower().endswith(FLAC_SUFFIX):
+                        continue
+                    if self.include_globs and not _matches_any(relative_path, self.include_globs):
+                        continue
+                    if not self._put_path(entry.path):
+                        return
+                    with self.lock:
+                        self.num_discovered += 1
+        except OSError:
+            pass                                     # Unreadable directory: skipped, as os.walk(onerror=None) did
+
+    def _worker(self) -> None:
+        while True:
+            directory = self.directories.get()
+            if directory is None:
+                return
+            self._list_directory(directory)
+            with self.lock:
+                self.pending_directories -= 1
+                all_listed = self.pending_directories == 0
+            if all_listed:
+                for _ in self.threads:
+                    self.directories.put(None)       # Wake every worker so it can exit
+                self._put_path(_DONE)
+
+    def __iter__(self) -> Iterator[str]:
+        self._enqueue_directory(self.root)
+        if self.pending_directories == 0:
+            self.finished = True
+            return
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"flac-discovery-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+        try:
+            while True:
+                path = self.paths.get()
+                if path is _DONE:
+                    self.finished = True
+                    return
+                yield path
+        finally:
+            if not self.finished:
+                self.stopped.set()                   # Consumer stopped early (error / Ctrl-C): let workers exit
+                for _ in self.threads:
+                    self.directories.put(None)
@@ -22,6 +22,8 @@ LOSSY_CUTOFF_PROFILES = {   # key stands for cutoff frequency in HZ; value stand
 
 PROBE_CUTOFFS_HZ = sorted(LOSSY_CUTOFF_PROFILES.keys())
 
+MAX_PROFILE_DISTANCE_HZ: float = 500.0   # an estimated cutoff this close to a profile cutoff is attributed to it
+
 def debug_energy_ratios(ratios):
     """
     Compute summary statistics over per-frame high-frequency (HF) energy ratios.
@@ -74,37 +76,61 @@ def debug_energy_ratios(ratios):
         "hf_ratio_mean": float(np.mean(x)),
     }
 
-def _active_fraction_from_cache(frame_ffts, cutoff_hz, energy_ratio_threshold, ratio_drop_threshold):
-    """Compute active_fraction at a given cutoff using cached FFTs (no re-FFT)."""
-    if not frame_ffts:
-        return 0.0
-    active = 0
-    total = 0
-    for f in frame_ffts:
-        # skip silent or invalid frames
-        if getattr(f, "total_energy", 0.0) <= 0.0:
-            continue
-        if getattr(f, "spectrum_abs", None) is None or getattr(f, "freqs_hz", None) is None:
-            continue
-        if f.spectrum_abs.size == 0 or f.freqs_hz.size == 0:
-            continue
-
-        # first bin strictly above cutoff
-        idx = np.searchsorted(f.freqs_hz, cutoff_hz, side="right")
-        if idx >= f.spectrum_abs.size:
-            ratio = 0.0
+def estimate_cutoff_frequency(energy_cache, samplerate):
+    """
+    Continuous cutoff estimate, by the classifier's own criterion: the lowest cached frequency whose
+    active fraction (frames with ratio > ENERGY_RATIO_THRESHOLD, among frames above RATIO_DROP_THRESHOLD)
+    is at most MAX_HF_ACTIVE_FRACTION_FOR_CUTOFF. Energy above f only falls as f rises, so the fraction
+    does too, and the cutoff is found by a binary search over the cached columns.
+    Returns Hz (Nyquist if the spectrum never goes quiet), or None without any valid frame.
+    Resolution is that of the cache: one FFT bin in memory, the fingerprint grid otherwise.
+    """
+    valid = energy_cache.total_energy > 0.0
+    if not np.any(valid):
+        return None
+    total_energy = energy_cache.total_energy[valid]
+
+    def is_quiet(column):
+        # Only this column is gathered, so the (frames, columns) matrix is never copied
+        ratios = energy_cache.energy_above[valid, column] / total_energy
+        significant = ratios > RATIO_DROP_THRESHOLD
+        num_significant = np.count_nonzero(significant)
+        if num_significant == 0:
+            return True
+        num_active = np.count_nonzero(significant & (ratios > ENERGY_RATIO_THRESHOLD))
+        return num_active / num_significant <= MAX_HF_ACTIVE_FRACTION_FOR_CUTOFF
+
+    lo, hi = 0, len(energy_cache.freqs_hz)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if is_quiet(mid):
+            hi = mid
         else:
-            ratio = float(np.sum(f.spectrum_abs[idx:]) / f.total_energy)
-
-        if ratio > float(ratio_drop_threshold):
-            total += 1
-            if ratio > float(energy_ratio_threshold):
-                active += 1
-    if total == 0:
-        return 0.0
-    return active / total
-
-def _estimate_bitrate_from_cache(frame_ffts, effective_cutoff, energy_ratio_threshold, ratio_drop_threshold, probe_cutoffs_hz=None):
+            lo = mid + 1
+    if lo == len(energy_cache.freqs_hz):
+        return samplerate / 2.0
+    return float(energy_cache.freqs_hz[lo])
+
+def nearest_cutoff_profile(cutoff_hz):
+    """Return the LOSSY_CUTOFF_PROFILES cutoff nearest to cutoff_hz, or None if none is within MAX_PROFILE_DISTANCE_HZ."""
+    if cutoff_hz is None:
+        return None
+    nearest = min(LOSSY_CUTOFF_PROFILES, key=lambda c: abs(c - cutoff_hz))
+    if abs(nearest - cutoff_hz) > MAX_PROFILE_DISTANCE_HZ:
+        return None
+    return nearest
+
+def _active_fractions_from_cache(energy_cache, cutoffs_hz, energy_ratio_threshold, ratio_drop_threshold):
+    """Compute active_fraction at every cutoff in one pass over the cached cumulative energies (no re-FFT)."""
+    ratios = energy_cache.ratios_above_each(cutoffs_hz)            # (frames, cutoffs); silent frames are 0.0
+    significant = ratios > float(ratio_drop_threshold)
+    active = significant & (ratios > float(energy_ratio_threshold))
+    num_significant = np.count_nonzero(significant, axis=0)
+    fractions = np.zeros(len(cutoffs_hz))
+    np.divide(np.count_nonzero(active, axis=0), num_significant, out=fractions, where=num_significant > 0)
+    return fractions
+
+def _estimate_bitrate_from_cache(energy_cache, effective_cutoff, energy_ratio_threshold, ratio_drop_threshold, probe_cutoffs_hz=None):
     """
     Probe multiple cutoffs (ascending). Return (label:str, confidence:float, per_cutoff_fractions:dict)
     Select the first cutoff (ascending) that becomes quiet while the previous cutoff is loud.
@@ -117,11 +143,9 @@ def _estimate_bitrate_from_cache(frame_ffts, effective_cutoff, energy_ratio_thre
     if not probe_list:
         return None, None, {}
 
-    per_cutoff_fractions = {}
-    # 1) Compute fractions for ALL candidate cutoffs (NO early break)
-    for c in probe_list:
-        frac = _active_fraction_from_cache(frame_ffts, c, energy_ratio_threshold, ratio_drop_threshold)
-        per_cutoff_fractions[c] = frac
+    # 1) Compute fractions for ALL candidate cutoffs at once (NO early break)
+    fractions = _active_fractions_from_cache(energy_cache, probe_list, energy_ratio_threshold, ratio_drop_threshold)
+    per_cutoff_fractions = {c: float(frac) for c, frac in zip(probe_list, fractions)}
 
     # 2) Select the FIRST cutoff where activity becomes "quiet" (ascending),
     #    and the previous cutoff (if any) was "loud".
@@ -160,27 +184,28 @@ def _estimate_bitrate_from_cache(frame_ffts, effective_cutoff, energy_ratio_thre
     confidence = float(np.clip(1.0 - (selected_frac or 0.0), 0.0, 1.0))
     return label, confidence, per_cutoff_fractions
 
-def determine_file_status(ratios, effective_cutoff, frame_ffts=None, probe_cutoffs_hz=None):
+def determine_file_status(ratios, effective_cutoff, energy_cache=None, probe_cutoffs_hz=None):
     """
     Decide ORIGINAL vs UPSCALED using per-frame energy-above-cutoff ratios.
 
     Expected:
       ratios: array-like of float in [0..1], each = fraction of frame energy above 'effective_cutoff'
       effective_cutoff: float (Hz) — the probe frequency for "energy above cutoff"
-      frame_ffts: optional list of cached per-frame FFT artifacts (for later bitrate estimation)
+      energy_cache: optional CumulativeEnergyCache with per-frame energy above (at least) the probe
+                    cutoffs (for later bitrate estimation)
       probe_cutoffs_hz: optional list of cutoffs to consider during bitrate estimation
                         (not used unless you integrate the estimation branch)
     Returns:
-      (status: str, confidence: float in [0,1])
+      (status: str, confidence: float in [0,1], per_cutoff_fractions: dict | None)
     """
     frame_energy_above_cutoff_ratios = np.asarray(ratios, dtype=float)
     if frame_energy_above_cutoff_ratios.size == 0:
-        return "No audio data.", 0.0
+        return "No audio data.", 0.0, None
 
     # Drop frames that are effectively silence / numerical dust
     frame_energy_above_cutoff_ratios = frame_energy_above_cutoff_ratios[frame_energy_above_cutoff_ratios > RATIO_DROP_THRESHOLD]
     if frame_energy_above_cutoff_ratios.size == 0:
-        return "Likely UPSCALED (no significant frames)", 0.0
+        return "Likely UPSCALED (no significant frames)", 0.0, None
 
     # A frame is "active" if it has non-trivial energy above the cutoff
     active_fraction = float(np.mean(frame_energy_above_cutoff_ratios > float(ENERGY_RATIO_THRESHOLD)))
@@ -198,8 +223,8 @@ def determine_file_status(ratios, effective_cutoff, frame_ffts=None, probe_cutof
         return "Likely ORIGINAL", confidence, None
 
     # Otherwise: little to no HF energy above the cutoff → try bitrate estimation if cache is available
-    if frame_ffts:
-        label, conf2, per_cutoff_fractions = _estimate_bitrate_from_cache(frame_ffts, effective_cutoff, ENERGY_RATIO_THRESHOLD, RATIO_DROP_THRESHOLD, probe_cutoffs_hz)
+    if energy_cache is not None:
+        label, conf2, per_cutoff_fractions = _estimate_bitrate_from_cache(energy_cache, effective_cutoff, ENERGY_RATIO_THRESHOLD, RATIO_DROP_THRESHOLD, probe_cutoffs_hz)
         if label is not None:
             return label, conf2, per_cutoff_fractions
          # estimation ran but didn't produce a label; still pass fractions upward
@@ -13,12 +13,144 @@
 # along with this program. If not, see https://www.gnu.org/licenses/.
 
 
+import argparse
 import os
 import sys
 
-from run_modes import run_single_file, run_folder_batch
+# Only the standard-library modules the argument parser needs are imported up front; each mode below
+# imports its own modules (NumPy, the analysis stack, executors, asyncio...) when it actually runs, so
+# `help`, argument errors and the lighter modes do not pay for the rest
+
+def build_argument_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Analyze a FLAC file, or every FLAC file under a folder, for signs of lossy upscaling.",
+    )
+    parser.add_argument("path", nargs="?",
+                        help="a .flac file (single-file mode) or a folder (batch mode, scanned recursively)")
+
+    parser.add_argument("--streaming", action="store_true",
+                        help="decode and analyze frame-sized blocks incrementally, so memory use stays "
+                             "constant regardless of track length")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="analyze a stratified sample of frames first and stop as soon as the verdict is "
+                             "statistically settled; only borderline files get the full pass")
+    parser.add_argument("--channels", choices=("first", "all", "mid-side"), default="first",
+                        help="analyze only the first channel (default; the others are never converted or kept), every "
+                             "channel, or every channel plus mid/side, with per-channel verdicts; 'all' and 'mid-side' "
+                             "run in memory (--streaming, --adaptive and --fingerprint-dir do not apply)")
+    parser.add_argument("--frame-size", type=int, default=None, metavar="SAMPLES",
+                        help="analysis frame length (default: about 0.74 s, the power of two nearest 32768 samples at "
+                             "44.1 kHz: 32768 at 44.1/48 kHz, 65536 at 88.2/96 kHz, 131072 at 176.4/192 kHz)")
+    parser.add_argument("--hop", type=int, default=None, metavar="SAMPLES",
+                        help="samples between frame starts, at most the frame size (default: half the frame size); files "
+                             "whose frame size it exceeds are reported as errors")
+    parser.add_argument("--instrument", action="store_true",
+                        help="record per-stage wall time, CPU time and peak allocation for every file (extra CSV "
+                             "columns) and print a per-stage summary; adds tracemalloc overhead")
+    parser.add_argument("--spectrogram-engine", choices=("native", "ffmpeg"), default="native",
+                        help="how spectrograms are drawn: in-process from the analysis spectra (default) or "
+                             "by ffmpeg, which decodes the file again")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report how long each imported module took to load (on stderr, after the run)")
+
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--jobs", type=int, default=None, metavar="N",
+                       help="number of worker processes (default: CPU count; 1 = sequential)")
+    batch.add_argument("--backend", choices=("process", "thread"), default="process",
+                       help="run workers as processes (default) or threads; threads need a free-threaded "
+                            "Python build (e.g. 3.14t) and fall back to processes when the GIL is enabled")
+    batch.add_argument("--task-timeout", type=float, default=None, metavar="SECONDS",
+                       help="report a file as 'ERROR (timeout)' if it takes longer than this")
+    batch.add_argument("--max-tasks-per-worker", type=int, default=None, metavar="K",
+                       help="recycle each worker process after K files")
+    batch.add_argument("--include", action="append", default=[], metavar="GLOB",
+                       help="only scan .flac files whose path (relative to the folder) or name matches GLOB; "
+                            "repeatable, case-insensitive")
+    batch.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                       help="skip files and whole directories whose relative path or name matches GLOB; repeatable")
+    batch.add_argument("--follow-symlinks", action="store_true",
+                       help="descend into symlinked directories (each directory is still listed only once)")
+
+    pipeline = parser.add_argument_group("pipelined batch mode")
+    pipeline.add_argument("--pipeline", action="store_true",
+                          help="read, decode and analyze files as overlapping stages with read-ahead, so storage "
+                               "latency and CPU work overlap (in-memory analysis; --streaming/--adaptive do not apply)")
+    pipeline.add_argument("--read-workers", type=int, default=None, metavar="N",
+                          help="threads reading raw file bytes (default: 2)")
+    pipeline.add_argument("--decode-workers", type=int, default=None, metavar="N",
+                          help="threads decoding FLAC from memory (default: CPU count)")
+    pipeline.add_argument("--analyze-workers", type=int, default=None, metavar="N",
+                          help="threads analyzing decoded audio (default: CPU count)")
+    pipeline.add_argument("--read-ahead", type=int, default=None, metavar="N",
+                          help="files read/decoded ahead of analysis (default: 8)")
+    pipeline.add_argument("--read-ahead-mb", type=int, default=None, metavar="MB",
+                          help="memory budget for read-ahead raw + decoded buffers (default: 512)")
+
+    columnar = parser.add_argument_group("columnar output")
+    columnar.add_argument("--columnar", nargs="?", const="auto", default=None, choices=("auto", "parquet", "npz"),
+                          help="also write batch/reclassify results next to the CSV as typed columns: Parquet "
+                               "(needs pyarrow; the default when installed) or NPZ")
+    columnar.add_argument("--frame-ratios", action="store_true",
+                          help="include each file's per-frame energy-above-cutoff ratios in the columnar output")
+
+    spectrograms = parser.add_argument_group("batch spectrograms")
+    spectrograms.add_argument("--spectrogram-dir", default=None, metavar="DIR",
+                              help="render a spectrogram of every Inconclusive or low-confidence file into DIR, "
+                                   "mirroring the scanned folder layout; rendering runs on separate processes while "
+                                   "the scan goes on")
+    spectrograms.add_argument("--spectrogram-below", type=float, default=None, metavar="CONFIDENCE",
+                              help="confidence (0-1) below which a file gets a spectrogram (default: 0.6)")
+    spectrograms.add_argument("--spectrogram-workers", type=int, default=None, metavar="N",
+                              help="processes rendering spectrograms, i.e. the cap on concurrent renders (default: 1)")
+
+    pcm_cache = parser.add_argument_group("decoded-PCM cache")
+    pcm_cache.add_argument("--pcm-cache", default=None, metavar="DIR",
+                           help="keep decoded float32 samples of every analyzed file in scratch folder DIR and memory-map "
+                                "them on later runs instead of decoding the FLAC again (in-memory analysis only)")
+    pcm_cache.add_argument("--pcm-cache-mb", type=int, default=None, metavar="MB",
+                           help="size limit of the --pcm-cache folder; least recently used files are deleted (default: 4096)")
+
+    fingerprints = parser.add_argument_group("spectral fingerprints")
+    fingerprints.add_argument("--fingerprint-dir", default=None, metavar="DIR",
+                              help="store a compact per-frame band-energy fingerprint of every analyzed file in DIR, "
+                                   "and classify unchanged files from it without decoding")
+    fingerprints.add_argument("--reclassify", default=None, metavar="DIR",
+                              help="re-run the classifier over every fingerprint in DIR (no audio is read) and exit")
+
+    service = parser.add_argument_group("scan service")
+    service.add_argument("--serve", action="store_true",
+                         help="run a long-lived scan service with a local HTTP/JSON API instead of scanning a path "
+                              "(uses --jobs and --backend for its workers)")
+    service.add_argument("--host", default=None,
+                         help="address the service listens on (default: 127.0.0.1; the API has no authentication)")
+    service.add_argument("--port", type=int, default=None,
+                         help="port the service listens on (default: 8765)")
+
+    database = parser.add_argument_group("result database")
+    database.add_argument("--db", default=None, metavar="DB_PATH",
+                          help="SQLite result store: unchanged files (same path, size and mtime) are served "
+                               "from it instead of being re-analyzed, and new results are saved to it")
+    database.add_argument("--verify-md5", action="store_true",
+                          help="also require the FLAC STREAMINFO MD5 to match before reusing a stored result")
+    database.add_argument("--export-csv", default=None, metavar="CSV_PATH",
+                          help="export every result stored in --db to CSV_PATH and exit")
+    return parser
 
 def main():
+    # Installed before anything else is imported, so the profile covers every module this run loads
+    profiler = None
+    if "--profile-startup" in sys.argv[1:]:
+        from startup_profiler import ImportTimer
+        profiler = ImportTimer().install()
+    try:
+        run_command()
+    finally:
+        if profiler is not None:
+            profiler.uninstall()
+            profiler.report()
+
+def run_command():
     # 0. Set instructions and manuals
     if len(sys.argv) < 2:
         print("Wrong number of arguments - check usage using 'py main.py help'")
@@ -27,16 +159,137 @@ def main():
     elif sys.argv[1] == "help":
         print("""Usage: py main.py "<path_to_flac_file>" (including .flac extension, and use quotes for correct shell parsing.)""")
         print("For example: python main.py X:\\path\\to\\file.flac")
+        print()
+        build_argument_parser().print_help()
+        return
+
+    # 1. Get file or folder path from command-line arguments and determine running mode
+    parser = build_argument_parser()
+    args = parser.parse_args()
+    path = args.path
+
+    if args.columnar == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            print("--columnar parquet needs pyarrow ('pip install pyarrow'); use --columnar npz instead.")
+            return
+
+    if args.export_csv:
+        if not args.db or not os.path.isfile(args.db):
+            print("--export-csv needs an existing result database passed with --db.")
+            return
+        from scan_result_database import ScanResultDatabase
+        with ScanResultDatabase(args.db) as database:
+            count = database.export_csv(args.export_csv)
+        print(f"Exported {count} results to '{args.export_csv}'.")
+        return
+
+    if args.serve:
+        if args.jobs is not None and args.jobs < 1:
+            print("--jobs must be at least 1.")
+            return
+        from batch_executors import gil_enabled
+        from scan_service import run_service
+        backend = args.backend
+        if backend == "thread" and gil_enabled():
+            print("Warning: the GIL is enabled in this interpreter; falling back to process workers.")
+            backend = "process"
+        run_service(args.host, args.port, jobs=args.jobs, backend=backend)
+        return
+
+    if args.reclassify:
+        if not os.path.isdir(args.reclassify):
+            print("Invalid fingerprint folder.")
+            return
+        from run_modes import run_reclassify
+        run_reclassify(args.reclassify, columnar_format=args.columnar, columnar_frame_ratios=args.frame_ratios)
+        return
+
+    if path is None:
+        parser.print_usage()
+        return
+
+    if args.frame_size is not None and args.frame_size < 256:
+        print("--frame-size must be at least 256 samples.")
+        return
+    if args.hop is not None and (args.hop < 1 or (args.frame_size is not None and args.hop > args.frame_size)):
+        print("--hop must be at least 1 and no larger than --frame-size.")
+        return
+    if args.pcm_cache_mb is not None and args.pcm_cache_mb < 1:
+        print("--pcm-cache-mb must be at least 1.")
         return
+    pcm_cache_bytes = None if args.pcm_cache_mb is None else args.pcm_cache_mb * 1024 * 1024
 
-    # 1. Get file or folder path from command-line argument and determine running mode
-    path = sys.argv[1]
+    if args.channels != "first" and (args.streaming or args.adaptive or args.fingerprint_dir):
+        print(f"Warning: --channels {args.channels} analyzes in memory; ignoring --streaming, --adaptive and --fingerprint-dir.")
 
     if os.path.isfile(path) and path.lower().endswith(".flac"):
-        run_single_file(path, want_verbose=True, want_spectrogram=True)
+        from run_modes import run_single_file
+        pcm_cache = None
+        if args.pcm_cache:
+            from decoded_pcm_cache import PCM_CACHE_MAX_BYTES, DecodedPcmCache
+            pcm_cache = DecodedPcmCache(args.pcm_cache, pcm_cache_bytes or PCM_CACHE_MAX_BYTES)
+        try:
+            run_single_file(path, want_verbose=True, want_spectrogram=True, streaming=args.streaming,
+                            fingerprint_dir=args.fingerprint_dir, adaptive=args.adaptive, instrument=args.instrument,
+                            channel_mode=args.channels, spectrogram_engine=args.spectrogram_engine, pcm_cache=pcm_cache,
+                            frame_size=args.frame_size, step=args.hop)
+        except ValueError as e:
+            # The file's frame geometry (a --hop beyond its default frame size) or an unreadable stream
+            print(f"Error: {e}")
 
     elif os.path.isdir(path):
-        run_folder_batch(path)
+        if args.jobs is not None and args.jobs < 1:
+            print("--jobs must be at least 1.")
+            return
+        if args.spectrogram_workers is not None and args.spectrogram_workers < 1:
+            print("--spectrogram-workers must be at least 1.")
+            return
+        pipeline = None
+        if args.pipeline:
+            if args.streaming or args.adaptive:
+                print("Warning: --streaming and --adaptive do not apply to --pipeline; ignoring them.")
+            settings = {
+                "read_workers": args.read_workers,
+                "decode_workers": args.decode_workers,
+                "analyze_workers": args.analyze_workers,
+                "read_ahead_files": args.read_ahead,
+                "read_ahead_bytes": None if args.read_ahead_mb is None else args.read_ahead_mb * 1024 * 1024,
+            }
+            pipeline = {k: v for k, v in settings.items() if v is not None}   # Unset ones get run_folder_batch defaults
+            if any(pipeline.get(k, 1) < 1 for k in ("read_workers", "decode_workers", "analyze_workers")):
+                print("Pipeline worker counts must be at least 1.")
+                return
+        from run_modes import run_folder_batch
+        run_folder_batch(
+            path,
+            jobs=args.jobs,
+            backend=args.backend,
+            task_timeout_s=args.task_timeout,
+            max_tasks_per_worker=args.max_tasks_per_worker,
+            streaming=args.streaming,
+            db_path=args.db,
+            use_streaminfo_md5=args.verify_md5,
+            fingerprint_dir=args.fingerprint_dir,
+            adaptive=args.adaptive,
+            columnar_format=args.columnar,
+            columnar_frame_ratios=args.frame_ratios,
+            include_globs=args.include,
+            exclude_globs=args.exclude,
+            follow_symlinks=args.follow_symlinks,
+            pipeline=pipeline,
+            instrument=args.instrument,
+            channel_mode=args.channels,
+            spectrogram_dir=args.spectrogram_dir,
+            spectrogram_below=args.spectrogram_below,
+            spectrogram_workers=args.spectrogram_workers,
+            spectrogram_engine=args.spectrogram_engine,
+            pcm_cache_dir=args.pcm_cache,
+            pcm_cache_bytes=pcm_cache_bytes,
+            frame_size=args.frame_size,
+            step=args.hop,
+        )
 
     else:
         print("Invalid file path or not a FLAC file.")
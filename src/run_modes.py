@@ -1,15 +1,34 @@
 # run_modes.py
+import io
 import time
 import os
+import numpy as np
 
+from functools import partial
 from typing import Any, Dict, Final, List, Optional
-from tqdm import tqdm
 from datetime import datetime
-from audio_frame_analysis import analyze_frame, divide_into_frames, calculate_effective_cutoff
-from audio_loader import load_flac
-from spectrogram_generator import spectrogram_for_flac
-from file_status_determination import determine_file_status
-from data_and_error_logging import append_result_to_csv
+from audio_frame_analysis import (
+    CumulativeEnergyCache,
+    StreamingFrameAnalyzer,
+    analyze_channel_frames,
+    analyze_frames,
+    calculate_effective_cutoff,
+    channel_labels,
+    divide_into_frames,
+    frame_count,
+    frame_geometry,
+)
+from audio_loader import flac_format_info, flac_stream_info, load_flac, stream_flac
+from spectrogram_generator import needs_spectrogram, spectrogram_analysis, spectrogram_for_flac
+from file_status_determination import (
+    LOSSY_CUTOFF_PROFILES,
+    PROBE_CUTOFFS_HZ,
+    determine_file_status,
+    estimate_cutoff_frequency,
+    nearest_cutoff_profile,
+)
+from data_and_error_logging import CsvResultSink
+from stage_instrumentation import INSTRUMENTED_STAGES, NO_INSTRUMENTATION, STAGE_FIELDNAMES, StageRecorder, print_stage_summary
 
 
 RESULT_FIELDNAMES: Final[List[str]] = [
@@ -18,13 +37,25 @@ RESULT_FIELDNAMES: Final[List[str]] = [
     "confidence",
     "elapsed_s",
     "samplerate_hz",
+    "sample_format",
+    "bit_depth",
     "num_samples",
     "num_total_frames",
+    "num_analyzed_frames",
     "num_non-silent_frames",
     "effective_cutoff_hz",
     "per_cutoff_active_fraction",
+    "estimated_cutoff_hz",
+    "nearest_profile_kbps",
+    "channel_mode",
+    "per_channel_status",
+    "per_channel_estimated_cutoff_hz",
+    "per_channel_active_fraction",
 ]
 
+CHANNEL_MODES = ("first", "all", "mid-side")     # first: channel 0 only (loaded alone); all / mid-side: per-channel verdicts
+MID_SIDE_LABELS = ("M", "S")                    # Diagnostic outputs: reported per channel, never the file's verdict
+
 def _format_fractions_for_csv(fractions: Optional[Dict[float, float]]) -> str:
     """
     Format {cutoff_hz: active_fraction} into a single CSV-friendly string.
@@ -34,23 +65,128 @@ def _format_fractions_for_csv(fractions: Optional[Dict[float, float]]) -> str:
         return ""
     return ";".join(f"{int(k)}={v:.4f}" for k, v in sorted(fractions.items()))
 
-def run_single_file(file_path, want_verbose, want_spectrogram):
-    # 1. Load audio
-    start_time = time.time()
-    data, samplerate = load_flac(file_path)
+def _load(file_path, channels=None, pcm_cache=None):
+    # From the decoded-PCM cache (memory-mapped, decoding only on a miss) when one is configured
+    if pcm_cache is not None:
+        return pcm_cache.load_flac(file_path, channels)
+    return load_flac(file_path, channels)
+
+def _analyze_in_memory(file_path, recorder=NO_INSTRUMENTATION, pcm_cache=None, frame_size=None, step=None):
+    # 1. Load audio (only the analyzed first channel is converted and kept)
+    with recorder.stage("decode"):
+        data, samplerate = _load(file_path, [0], pcm_cache)
+    return _analyze_pcm(data, samplerate, recorder, frame_size, step)
+
+def _analyze_in_memory_channels(file_path, mid_side, recorder=NO_INSTRUMENTATION, pcm_cache=None, frame_size=None, step=None):
+    with recorder.stage("decode"):
+        data, samplerate = _load(file_path, None, pcm_cache)
+    return _analyze_pcm_channels(data, samplerate, mid_side, recorder, frame_size, step)
 
-    # 2. Divide into frames
-    frames = divide_into_frames(data)
+def _analyze_pcm(data, samplerate, recorder=NO_INSTRUMENTATION, frame_size=None, step=None):
+    with recorder.stage("analyze"):
+        # 2. Divide into frames (zero-copy strided view; frame size and hop follow the sample rate unless given)
+        frames = divide_into_frames(data, *frame_geometry(samplerate, frame_size, step))
 
-    # 3. Calculate (once per file, then reuse everywhere)
+        # 3. Calculate (once per file, then reuse everywhere)
+        effective_cutoff_hz = calculate_effective_cutoff(samplerate)
+
+        # 4. Analyze all frames in batches — same 'effective_cutoff' for all frames; also keep the cumulative-energy cache for later reuse
+        ratios, energy_cache = analyze_frames(frames, samplerate, effective_cutoff_hz)
+    return ratios, energy_cache, samplerate, len(data), effective_cutoff_hz
+
+def _analyze_pcm_channels(data, samplerate, mid_side, recorder=NO_INSTRUMENTATION, frame_size=None, step=None):
+    """
+    Per-channel counterpart of _analyze_pcm(): returns (analysis, channel_analyses), where analysis is
+    the first channel's usual tuple and channel_analyses lists (label, ratios, cache) for every channel
+    (plus mid and side). Caches keep only the fingerprint grid, so memory stays small per channel.
+    """
+    from spectral_fingerprint_cache import fingerprint_grid
+
+    with recorder.stage("analyze"):
+        frames = divide_into_frames(data, *frame_geometry(samplerate, frame_size, step))
+        effective_cutoff_hz = calculate_effective_cutoff(samplerate)
+        cache_freqs_hz = fingerprint_grid(samplerate, [*PROBE_CUTOFFS_HZ, effective_cutoff_hz])
+        outputs = analyze_channel_frames(frames, samplerate, effective_cutoff_hz, mid_side, cache_freqs_hz)
+    labels = channel_labels(1 if data.ndim == 1 else data.shape[1], mid_side)
+    channel_analyses = [(label, ratios, cache) for label, (ratios, cache) in zip(labels, outputs)]
+    ratios, energy_cache = outputs[0]
+    return (ratios, energy_cache, samplerate, len(data), effective_cutoff_hz), channel_analyses
+
+def _analyze_streaming(file_path, frame_size=None, step=None):
+    # 1-4. Decode frame-sized blocks on demand and analyze them as they arrive; instead of full spectra,
+    #      keep only each frame's energy above the classifier's cutoffs and the (coarse) fingerprint grid
+    from spectral_fingerprint_cache import fingerprint_grid
+
+    samplerate, _ = flac_stream_info(file_path)                  # The frame geometry depends on the sample rate
+    if samplerate is None:
+        raise ValueError(f"could not read '{file_path}'")
+    frame_size, step = frame_geometry(samplerate, frame_size, step)
+    frames, samplerate, num_samples = stream_flac(file_path, frame_size, step)
     effective_cutoff_hz = calculate_effective_cutoff(samplerate)
+    cache_freqs_hz = fingerprint_grid(samplerate, [*PROBE_CUTOFFS_HZ, effective_cutoff_hz])
+    analyzer = StreamingFrameAnalyzer(
+        samplerate,
+        effective_cutoff_hz,
+        frame_size=frame_size,
+        cache_freqs_hz=cache_freqs_hz,
+    )
+    for frame in frames:
+        analyzer.feed(frame)
+    ratios, energy_cache = analyzer.finish()
+    return ratios, energy_cache, samplerate, num_samples, effective_cutoff_hz
+
+def _analyze_from_fingerprint(energy_cache, samplerate, num_samples):
+    # No decode, no FFT: ratios at the (current) effective cutoff come straight from the stored energies
+    effective_cutoff_hz = calculate_effective_cutoff(samplerate)
+    ratios = energy_cache.ratios_above(effective_cutoff_hz)
+    return ratios, energy_cache, samplerate, num_samples, effective_cutoff_hz
+
+def _classify(ratios, energy_cache, samplerate, effective_cutoff_hz):
+    status, confidence, fractions = determine_file_status(ratios, effective_cutoff_hz, energy_cache=energy_cache)
+    return status, confidence, fractions, estimate_cutoff_frequency(energy_cache, samplerate)
 
-    # 4. Analyze each frame — use the same 'effective_cutoff' for all frames; also collect FFT cache for later reuse
-    fft_cache = []
-    ratios = [analyze_frame(frame, samplerate, effective_cutoff_hz, fft_cache_list=fft_cache) for frame in frames]
+def _channel_rank(channel):
+    # Lowest rank decides the file: a confidently upscaled channel first, then inconclusive, then the weakest original
+    _, _, status, confidence, _, _ = channel
+    if "ORIGINAL" in status:
+        return 2, confidence
+    if "UPSCALED" in status:
+        return 0, -confidence
+    return 1, 0.0
 
+def _format_channel_fields(per_channel):
+    return {
+        "per_channel_status": " | ".join(f"{label}: {status} ({confidence * 100:.1f}%)"
+                                         for label, _, status, confidence, _, _ in per_channel),
+        "per_channel_estimated_cutoff_hz": ";".join(f"{label}={'' if cutoff is None else round(cutoff)}"
+                                                    for label, _, _, _, _, cutoff in per_channel),
+        "per_channel_active_fraction": "|".join(f"{label}:{_format_fractions_for_csv(fractions)}"
+                                                for label, _, _, _, fractions, _ in per_channel if fractions),
+    }
+
+def _format_fields(sample_format, bit_depth):
+    return {"sample_format": sample_format, "bit_depth": "" if bit_depth is None else bit_depth}
+
+def _build_result(file_path, ratios, energy_cache, samplerate, num_samples, effective_cutoff_hz, start_time, want_verbose,
+                  recorder=NO_INSTRUMENTATION, channel_mode="first", channel_analyses=None, frame_size=None, step=None):
     # 5. Determine status + confidence + fractions + elapsed time
-    status, confidence, fractions = determine_file_status(ratios, effective_cutoff_hz, frame_ffts=fft_cache)  # CHANGED: pass cache
+    with recorder.stage("classify"):
+        status, confidence, fractions, estimated_cutoff_hz = _classify(ratios, energy_cache, samplerate, effective_cutoff_hz)
+        channel_fields = {}
+        verdict_channel = None
+        if channel_analyses:
+            per_channel = [(label, channel_ratios, *_classify(channel_ratios, channel_cache, samplerate, effective_cutoff_hz))
+                           for label, channel_ratios, channel_cache in channel_analyses]
+            # The file is only as original as its weakest real channel; mid/side are reported, not decisive
+            verdict = min((c for c in per_channel if c[0] not in MID_SIDE_LABELS), key=_channel_rank)
+            _, ratios, status, confidence, fractions, estimated_cutoff_hz = verdict
+            verdict_channel = per_channel.index(verdict)             # Real channels come first, in file order
+            channel_fields = _format_channel_fields(per_channel)
+        nearest_profile_hz = nearest_cutoff_profile(estimated_cutoff_hz)
+
+    num_total_frames = frame_count(num_samples, *frame_geometry(samplerate, frame_size, step))
+    num_analyzed_frames = len(ratios)                    # Fewer than num_total_frames when an adaptive sample settled it
+    num_non_silent_frames = int(np.count_nonzero(ratios > 0))
     #summary = debug_energy_ratios(ratios)
     elapsed = time.time() - start_time
 
@@ -63,19 +199,36 @@ def run_single_file(file_path, want_verbose, want_spectrogram):
             "confidence": confidence,
             "elapsed_s": elapsed,
             "samplerate_hz": samplerate,
-            "num_samples": len(data),
-            "num_total_frames": len(frames),
-            "num_non-silent_frames": sum(r > 0 for r in ratios),
+            "num_samples": num_samples,
+            "num_total_frames": num_total_frames,
+            "num_analyzed_frames": num_analyzed_frames,
+            "num_non-silent_frames": num_non_silent_frames,
             "effective_cutoff_hz": effective_cutoff_hz,
             "per_cutoff_active_fraction": _format_fractions_for_csv(fractions),
+            "estimated_cutoff_hz": "" if estimated_cutoff_hz is None else round(estimated_cutoff_hz),
+            "nearest_profile_kbps": "" if nearest_profile_hz is None else LOSSY_CUTOFF_PROFILES[nearest_profile_hz],
+            "channel_mode": channel_mode,
+            **channel_fields,
+            # Not CSV columns: kept for the columnar output
+            "per_cutoff_fractions": fractions or {},
+            "frame_ratios": np.asarray(ratios, dtype=np.float32),
+            "verdict_channel": verdict_channel,                      # Per-channel runs: index of the deciding channel
         }
     )
 
     if want_verbose:
-        print(f"Loaded '{file_path}' with sample rate {samplerate} Hz, {len(data)} samples.")
-        print(f"Divided audio into {len(frames)} frames for analysis.")
-        print(f"Analyzed {len(frames)} frames ({sum(r > 0 for r in ratios)} non-silent).")
+        print(f"Loaded '{file_path}' with sample rate {samplerate} Hz, {num_samples} samples.")
+        print(f"Divided audio into {num_total_frames} frames for analysis.")
+        print(f"Analyzed {num_analyzed_frames} of {num_total_frames} frames ({num_non_silent_frames} non-silent).")
         print(f"Result: {status} (Confidence: {confidence * 100:.1f}%)")
+        if estimated_cutoff_hz is not None:
+            nearest = f"nearest profile <={LOSSY_CUTOFF_PROFILES[nearest_profile_hz]} kbps" if nearest_profile_hz else "no matching profile"
+            print(f"Estimated cutoff: {estimated_cutoff_hz:.0f} Hz ({nearest})")
+        if channel_analyses:
+            print("Per-channel results:")
+            for label, _, channel_status, channel_confidence, _, channel_cutoff_hz in per_channel:
+                cutoff = "" if channel_cutoff_hz is None else f", estimated cutoff {channel_cutoff_hz:.0f} Hz"
+                print(f"  {label}: {channel_status} (Confidence: {channel_confidence * 100:.1f}%{cutoff})")
         print(f"Processing time: {elapsed:.2f} seconds")
         print("Energy-above-cutoff summary:")
 
@@ -84,29 +237,389 @@ def run_single_file(file_path, want_verbose, want_spectrogram):
             for k, v in sorted(fractions.items()):
                 print(f"  {int(k)}: {v:.4f}")
 
+    return result
+
+def _save_analysis_fingerprint(fingerprint_dir, file_path, analysis, frame_size=None, step=None):
+    from spectral_fingerprint_cache import fingerprint_grid, save_fingerprint
+
+    ratios, energy_cache, samplerate, num_samples, effective_cutoff_hz = analysis
+    grid_hz = fingerprint_grid(samplerate, [*PROBE_CUTOFFS_HZ, effective_cutoff_hz])
+    save_fingerprint(fingerprint_dir, file_path, energy_cache.at_freqs(grid_hz), samplerate, num_samples, frame_size, step)
+
+def _verdict_channel_analysis(analysis, channel_analyses, verdict_channel):
+    # Per-channel runs draw the channel that decided the verdict, not channel 0, so the picture shows what was flagged
+    if verdict_channel is None:
+        return analysis
+    _, ratios, energy_cache = channel_analyses[verdict_channel]
+    _, _, samplerate, num_samples, effective_cutoff_hz = analysis
+    return ratios, energy_cache, samplerate, num_samples, effective_cutoff_hz
+
+def _attach_spectrogram_analysis(result, analysis, spectrogram_below, frame_size=None, step=None):
+    if spectrogram_below is not None and needs_spectrogram(result["status"], result["confidence"], spectrogram_below):
+        result["spectrogram_analysis"] = spectrogram_analysis(analysis, frame_size, step)
+
+def _print_stage_timings(fields):
+    print("Stage timings (wall / CPU / peak traced allocation):")
+    for stage in INSTRUMENTED_STAGES:
+        if fields.get(f"{stage}_wall_s", "") != "":
+            print(f"  {stage:<12} {fields[f'{stage}_wall_s']:8.3f} s {fields[f'{stage}_cpu_s']:8.3f} s "
+                  f"{fields[f'{stage}_peak_mb']:8.1f} MB")
+
+def run_single_file(file_path, want_verbose, want_spectrogram, streaming=False, fingerprint_dir=None, adaptive=False,
+                    instrument=False, channel_mode="first", spectrogram_engine="native", spectrogram_below=None,
+                    pcm_cache=None, frame_size=None, step=None):
+    """
+    channel_mode: "first" analyzes channel 0 only (the only one decoded into memory); "all" and
+                  "mid-side" analyze every channel (and mid/side) in memory with per-channel verdicts,
+                  so streaming, adaptive sampling and fingerprints (which hold one channel) do not apply.
+    spectrogram_engine: "native" draws the spectrogram from this analysis's spectra (no second decode);
+                        "ffmpeg" renders it with ffmpeg's showspectrumpic.
+    spectrogram_below: batch mode; when the file is Inconclusive or its confidence is below this, the
+                       result carries "spectrogram_analysis" (not a CSV column) for a BatchSpectrogramRenderer.
+    pcm_cache: a DecodedPcmCache; in-memory analysis then maps the file's decoded samples from it
+               (decoding and storing them on a miss). Streaming and adaptive runs decode as usual.
+    frame_size / step: analysis frame length and hop in samples; None picks frame_geometry()'s
+                       sample-rate-aware default (~0.74 s frames, half-frame hop). Fingerprints made
+                       with another geometry are not reused.
+    """
+    start_time = time.time()
+    analysis = None
+    channel_analyses = None
+    recorder = StageRecorder() if instrument else NO_INSTRUMENTATION
+    if channel_mode != "first":
+        streaming, adaptive, fingerprint_dir = False, False, None
+
+    # A fingerprint of the unchanged file holds everything the classifier needs: skip decode and FFT entirely
+    if fingerprint_dir is not None:
+        from spectral_fingerprint_cache import load_current_fingerprint
+        with recorder.stage("read"):
+            energy_cache, metadata = load_current_fingerprint(fingerprint_dir, file_path, frame_size, step)
+        if energy_cache is not None:
+            analysis = _analyze_from_fingerprint(energy_cache, metadata["samplerate"], metadata["num_samples"])
+
+    # A decisive stratified sample settles most files; it is never stored as a (full-track) fingerprint
+    if analysis is None and adaptive:
+        from adaptive_frame_sampling import analyze_adaptive
+        with recorder.stage("analyze"):             # Seeking decodes of the sampled frames are timed with their FFTs
+            analysis = analyze_adaptive(file_path, frame_size, step)
+
+    if analysis is None:
+        if channel_mode != "first":
+            analysis, channel_analyses = _analyze_in_memory_channels(file_path, channel_mode == "mid-side", recorder,
+                                                                     pcm_cache, frame_size, step)
+        elif streaming:
+            with recorder.stage("analyze"):         # Decoding is interleaved with the FFTs, so it is timed with them
+                analysis = _analyze_streaming(file_path, frame_size, step)
+        else:
+            analysis = _analyze_in_memory(file_path, recorder, pcm_cache, frame_size, step)
+
+        if fingerprint_dir is not None:
+            with recorder.stage("fingerprint"):
+                _save_analysis_fingerprint(fingerprint_dir, file_path, analysis, frame_size, step)
+
+    result = _build_result(file_path, *analysis, start_time, want_verbose, recorder, channel_mode, channel_analyses,
+                           frame_size, step)
+    result.update(_format_fields(*flac_format_info(file_path)))          # Header only; the decode never returns it
+    spectrogram_source = _verdict_channel_analysis(analysis, channel_analyses, result["verdict_channel"])
+    _attach_spectrogram_analysis(result, spectrogram_source, spectrogram_below, frame_size, step)
+
     if want_spectrogram:
-        spectrogram_for_flac(file_path)
+        with recorder.stage("spectrogram"):
+            spectrogram_for_flac(file_path, spectrogram_engine, spectrogram_source, pcm_cache=pcm_cache,
+                                 frame_size=frame_size, step=step, channel=result["verdict_channel"])
 
+    result.update(recorder.fields())
+    if want_verbose and instrument:
+        _print_stage_timings(result)
     return result
 
-def run_folder_batch(folder_path):
+# --- Pipelined batch stages (see batch_executors.iter_pipelined_results) ---
+# Payloads carry the read start time, so elapsed_s spans the whole pipeline for that file, and the
+# file's StageRecorder, so each stage is timed on the thread that runs it.
+
+def _pipeline_read(file_path, fingerprint_dir=None, instrument=False, frame_size=None, step=None):
+    # I/O stage: the whole compressed file into memory, or its fingerprint if that is current
+    start_time = time.time()
+    recorder = StageRecorder() if instrument else NO_INSTRUMENTATION
+    with recorder.stage("read"):
+        if fingerprint_dir is not None:
+            from spectral_fingerprint_cache import load_current_fingerprint
+            energy_cache, metadata = load_current_fingerprint(fingerprint_dir, file_path, frame_size, step)
+            if energy_cache is not None:
+                return start_time, recorder, (energy_cache, metadata)
+        with open(file_path, "rb") as f:
+            return start_time, recorder, f.read()
+
+def _pipeline_decode(file_path, payload, channel_mode="first"):
+    # Decode stage: from the in-memory bytes, no further I/O
+    start_time, recorder, raw = payload
+    if not isinstance(raw, bytes):
+        return payload                                  # Fingerprint: nothing to decode
+    with recorder.stage("decode"):
+        buffer = io.BytesIO(raw)
+        sample_format, bit_depth = flac_format_info(buffer)
+        buffer.seek(0)
+        data, samplerate = load_flac(buffer, channels=[0] if channel_mode == "first" else None)
+    if data is None:
+        raise ValueError(f"could not decode '{file_path}'")
+    return start_time, recorder, (data, samplerate, _format_fields(sample_format, bit_depth))
+
+def _pipeline_analyze(file_path, payload, fingerprint_dir=None, channel_mode="first", spectrogram_below=None,
+                      frame_size=None, step=None):
+    # Analysis stage: frames + batched FFT + classification
+    start_time, recorder, decoded = payload
+    channel_analyses = None
+    if isinstance(decoded[0], CumulativeEnergyCache):
+        energy_cache, metadata = decoded
+        analysis = _analyze_from_fingerprint(energy_cache, metadata["samplerate"], metadata["num_samples"])
+        format_fields = _format_fields(*flac_format_info(file_path))
+    else:
+        data, samplerate, format_fields = decoded
+        if channel_mode != "first":
+            analysis, channel_analyses = _analyze_pcm_channels(data, samplerate, channel_mode == "mid-side", recorder,
+                                                               frame_size, step)
+        else:
+            analysis = _analyze_pcm(data, samplerate, recorder, frame_size, step)
+        if fingerprint_dir is not None:
+            with recorder.stage("fingerprint"):
+                _save_analysis_fingerprint(fingerprint_dir, file_path, analysis, frame_size, step)
+    result = _build_result(file_path, *analysis, start_time, want_verbose=False, recorder=recorder,
+                           channel_mode=channel_mode, channel_analyses=channel_analyses, frame_size=frame_size, step=step)
+    result.update(format_fields)
+    _attach_spectrogram_analysis(result, _verdict_channel_analysis(analysis, channel_analyses, result["verdict_channel"]),
+                                 spectrogram_below, frame_size, step)
+    result.update(recorder.fields())
+    return result
+
+def _open_columnar_sink(csv_path, columnar_format, columnar_frame_ratios, extra_float_columns=()):
+    if columnar_format is None:
+        return None
+    from columnar_result_output import ColumnarResultSink
+    return ColumnarResultSink(os.path.splitext(csv_path)[0], columnar_format, include_frame_ratios=columnar_frame_ratios,
+                              extra_float_columns=extra_float_columns)
+
+def run_reclassify(fingerprint_dir, columnar_format=None, columnar_frame_ratios=False):
+    """Re-run the classifier over every stored fingerprint (current thresholds/cutoffs), without any audio."""
+    from tqdm import tqdm
+    from spectral_fingerprint_cache import iter_fingerprint_paths, load_fingerprint
+
+    current_datetime = datetime.now()
+    current_daytime_formatted = current_datetime.strftime('%Y-%B-%d__%H-%M-%S')
+    csv_path = os.path.join(fingerprint_dir, "reclassified__" + current_daytime_formatted + ".csv")
+
+    fingerprint_paths = list(iter_fingerprint_paths(fingerprint_dir))
+    print("Found {} fingerprints.".format(len(fingerprint_paths)))
+    columnar_sink = _open_columnar_sink(csv_path, columnar_format, columnar_frame_ratios)
+    try:
+        with CsvResultSink(csv_path) as result_sink:
+            for path in tqdm(fingerprint_paths):
+                start_time = time.time()
+                energy_cache, metadata = load_fingerprint(path)
+                if energy_cache is None:
+                    continue                            # Unreadable or from an older fingerprint layout
+                analysis = _analyze_from_fingerprint(energy_cache, metadata["samplerate"], metadata["num_samples"])
+                result = _build_result(metadata["source_path"], *analysis, start_time, want_verbose=False,
+                                       frame_size=metadata["frame_size"], step=metadata["step"])
+                result_sink.write(result)
+                if columnar_sink is not None:
+                    columnar_sink.write(result)
+    finally:
+        if columnar_sink is not None:
+            columnar_sink.close()
+    print(f"Results saved to '{csv_path}'.")
+    if columnar_sink is not None:
+        print(f"Columnar results saved to '{columnar_sink.path}'.")
+
+def _run_batch_task(file_path, streaming=False, fingerprint_dir=None, adaptive=False, instrument=False, channel_mode="first",
+                    spectrogram_below=None, pcm_cache=None, frame_size=None, step=None):
+    # One batch unit of work: never verbose, never draws a spectrogram itself, never raises (also runs inside pool workers)
+    try:
+        return run_single_file(file_path, want_verbose=False, want_spectrogram=False, streaming=streaming,
+                               fingerprint_dir=fingerprint_dir, adaptive=adaptive, instrument=instrument,
+                               channel_mode=channel_mode, spectrogram_below=spectrogram_below, pcm_cache=pcm_cache,
+                               frame_size=frame_size, step=step)
+    except Exception:
+        return {"path": file_path, "status": "ERROR"}
+
+def run_folder_batch(folder_path, jobs=None, backend="process", task_timeout_s=None, max_tasks_per_worker=None, streaming=False,
+                     db_path=None, use_streaminfo_md5=False, fingerprint_dir=None, adaptive=False, columnar_format=None,
+                     columnar_frame_ratios=False, include_globs=(), exclude_globs=(), follow_symlinks=False, pipeline=None,
+                     instrument=False, channel_mode="first", spectrogram_dir=None, spectrogram_below=None,
+                     spectrogram_workers=None, spectrogram_engine="native", pcm_cache_dir=None, pcm_cache_bytes=None,
+                     frame_size=None, step=None):
+    """
+    pipeline: None for the per-file modes above, or a dict of iter_pipelined_results() worker settings
+              (read_workers, decode_workers, analyze_workers, read_ahead_files, read_ahead_bytes) to run
+              read, decode and analysis as overlapping stages instead; settings left out get the
+              batch_executors defaults.
+    instrument: add per-stage wall/CPU/peak-memory columns (STAGE_FIELDNAMES) to every analyzed file's
+                result and print a per-stage summary with histograms at the end.
+    channel_mode: see run_single_file(); per-channel modes never read or write fingerprints.
+    spectrogram_dir: render a spectrogram of every analyzed file that is Inconclusive or below
+                     spectrogram_below confidence (default SPECTROGRAM_CONFIDENCE_BELOW) into this folder,
+                     mirroring the scanned tree, on spectrogram_workers separate processes
+                     (default SPECTROGRAM_WORKERS) while the scan goes on.
+    pcm_cache_dir: keep every decoded file in a DecodedPcmCache there, bounded by pcm_cache_bytes
+                   (default PCM_CACHE_MAX_BYTES), so repeat scans map the samples instead of decoding;
+                   the pipeline decodes from its own in-memory reads and does not use it.
+    frame_size / step: see run_single_file().
+    """
+    # Batch-only dependencies are imported here, so single-file runs start without them
+    from tqdm import tqdm
+    from batch_executors import (
+        PIPELINE_READ_AHEAD_BYTES,
+        PIPELINE_READ_AHEAD_FILES,
+        PIPELINE_READ_WORKERS,
+        default_job_count,
+        gil_enabled,
+        iter_pipelined_results,
+        iter_process_pool_results,
+        iter_thread_pool_results,
+    )
+    from spectrogram_generator import SPECTROGRAM_CONFIDENCE_BELOW, SPECTROGRAM_WORKERS, BatchSpectrogramRenderer
+    from decoded_pcm_cache import PCM_CACHE_MAX_BYTES, DecodedPcmCache
+    from file_discovery import FileDiscovery
+    from scan_result_database import ScanResultDatabase, file_signature
+
     current_datetime = datetime.now()
     current_daytime_formatted = current_datetime.strftime('%Y-%B-%d__%H-%M-%S')
     csv_path = os.path.join(folder_path, current_daytime_formatted + ".csv")
-    flac_file_paths = []
 
+    # Discovery runs in background threads and streams paths straight into the analysis below,
+    # so the first results appear while the tree is still being listed
     print("Discovering files...")
-    for dirpath, dirnames, filenames in os.walk(folder_path, topdown=True, onerror=None, followlinks=False):
-        for filename in filenames:
-            full_path = os.path.join(dirpath, filename)
-            if full_path.lower().endswith(".flac"):
-                flac_file_paths.append(full_path)
-
-    print("Discovered {} files.".format(len(flac_file_paths)))
-    print("Processing files and saving results...")
-    for flac_file_path in tqdm(flac_file_paths):
-        try:
-            result = run_single_file(flac_file_path, want_verbose=False, want_spectrogram=False)
-        except Exception:
-            result = {"path": flac_file_path, "status": "ERROR"}
-        append_result_to_csv(csv_path, result)
+    discovery = FileDiscovery(folder_path, include_globs, exclude_globs, follow_symlinks=follow_symlinks)
+
+    if jobs is None:
+        jobs = default_job_count()
+    if channel_mode != "first":
+        fingerprint_dir, adaptive = None, False       # As in run_single_file(), so stored results record what ran
+
+    if backend == "thread" and gil_enabled():
+        print("Warning: the GIL is enabled in this interpreter, so threads cannot analyze files in parallel.")
+        print("         Use a free-threaded build (e.g. python3.14t) for the thread backend; falling back to processes.")
+        backend = "process"
+    if backend == "thread" and (task_timeout_s is not None or max_tasks_per_worker is not None):
+        print("Warning: task timeouts and worker recycling only apply to the process backend; ignoring them.")
+
+    # One long-lived, buffered writer for the whole run; closed (and flushed) even on Ctrl-C
+    stage_fieldnames = STAGE_FIELDNAMES if instrument else []
+    result_sink = CsvResultSink(csv_path, fieldnames=[*RESULT_FIELDNAMES, *stage_fieldnames])
+    columnar_sink = _open_columnar_sink(csv_path, columnar_format, columnar_frame_ratios, extra_float_columns=stage_fieldnames)
+    stage_rows = []                                   # Only the stage columns are kept for the end-of-run summary
+    database = ScanResultDatabase(db_path, frame_size=frame_size, step=step, adaptive=adaptive,
+                                  channel_mode=channel_mode) if db_path else None
+    pcm_cache = None
+    if pcm_cache_dir is not None:
+        pcm_cache = DecodedPcmCache(pcm_cache_dir, pcm_cache_bytes or PCM_CACHE_MAX_BYTES)
+    renderer = None
+    if spectrogram_dir is not None:
+        spectrogram_below = SPECTROGRAM_CONFIDENCE_BELOW if spectrogram_below is None else spectrogram_below
+        renderer = BatchSpectrogramRenderer(folder_path, spectrogram_dir, spectrogram_engine,
+                                            workers=spectrogram_workers or SPECTROGRAM_WORKERS, pcm_cache=pcm_cache,
+                                            frame_size=frame_size, step=step)
+    else:
+        spectrogram_below = None
+    signatures = {}
+    num_cached = 0
+
+    def files_to_analyze():
+        # Serve unchanged files from the result database; only new or modified files get analyzed
+        nonlocal num_cached
+        for flac_file_path in discovery:
+            if database is None:
+                yield flac_file_path
+                continue
+            try:
+                signature = file_signature(flac_file_path, use_streaminfo_md5)
+            except OSError:
+                yield flac_file_path                   # Vanished/unreadable; let the analysis report it
+                continue
+            cached_result = database.lookup(flac_file_path, signature)
+            if cached_result is not None:
+                result_sink.write(cached_result)
+                if columnar_sink is not None:
+                    columnar_sink.write(cached_result)
+                num_cached += 1
+            else:
+                signatures[flac_file_path] = signature
+                yield flac_file_path
+
+    try:
+        task = partial(_run_batch_task, streaming=streaming, fingerprint_dir=fingerprint_dir, adaptive=adaptive,
+                       instrument=instrument, channel_mode=channel_mode, spectrogram_below=spectrogram_below,
+                       pcm_cache=pcm_cache, frame_size=frame_size, step=step)
+        if pipeline is not None:
+            pipeline = {
+                "read_workers": PIPELINE_READ_WORKERS,
+                "decode_workers": default_job_count(),
+                "analyze_workers": default_job_count(),
+                "read_ahead_files": PIPELINE_READ_AHEAD_FILES,
+                "read_ahead_bytes": PIPELINE_READ_AHEAD_BYTES,
+                **pipeline,
+            }
+            print("Processing files in a read/decode/analyze pipeline "
+                  f"({pipeline['read_workers']}/{pipeline['decode_workers']}/{pipeline['analyze_workers']} workers) "
+                  "and saving results...")
+            results = iter_pipelined_results(
+                files_to_analyze(),
+                partial(_pipeline_read, fingerprint_dir=fingerprint_dir, instrument=instrument, frame_size=frame_size, step=step),
+                partial(_pipeline_decode, channel_mode=channel_mode),
+                partial(_pipeline_analyze, fingerprint_dir=fingerprint_dir, channel_mode=channel_mode,
+                        spectrogram_below=spectrogram_below, frame_size=frame_size, step=step),
+                **pipeline,
+            )
+        elif jobs == 1:
+            print("Processing files and saving results...")
+            results = map(task, files_to_analyze())
+        elif backend == "thread":
+            print(f"Processing files with {jobs} threads (free-threaded) and saving results...")
+            results = iter_thread_pool_results(files_to_analyze(), task, jobs)
+        else:
+            print(f"Processing files with {jobs} worker processes and saving results...")
+            results = iter_process_pool_results(
+                files_to_analyze(),
+                task,
+                jobs,
+                task_timeout_s=task_timeout_s,
+                max_tasks_per_worker=max_tasks_per_worker,
+            )
+
+        with tqdm(total=0, unit="file") as progress:
+            for result in results:
+                if renderer is not None:
+                    renderer.submit(result)                # Queued on its own pool; never waits for a render
+                result_sink.write(result)
+                if columnar_sink is not None:
+                    columnar_sink.write(result)
+                if instrument:
+                    stage_rows.append({k: result.get(k, "") for k in ["path", *STAGE_FIELDNAMES]})
+                signature = signatures.pop(result["path"], None)
+                if database is not None and signature is not None and not str(result["status"]).startswith("ERROR"):
+                    database.store(result, signature)      # Errors are retried on the next run
+                progress.total = discovery.num_discovered - num_cached   # Grows while discovery is still running
+                progress.update(1)
+            progress.total = progress.n
+            progress.refresh()
+
+        print("Discovered {} files.".format(discovery.num_discovered))
+        if database is not None:
+            print(f"{num_cached} unchanged files served from the result database, "
+                  f"{discovery.num_discovered - num_cached} analyzed.")
+        if instrument:
+            print_stage_summary(stage_rows)
+        if renderer is not None:
+            if renderer.num_pending:
+                print(f"Waiting for {renderer.num_pending} spectrograms to finish rendering...")
+            renderer.close()
+            print(f"Rendered {renderer.num_rendered} spectrograms into '{spectrogram_dir}'"
+                  + (f" ({renderer.num_failed} failed)." if renderer.num_failed else "."))
+    finally:
+        if renderer is not None:
+            renderer.close(cancel=True)                   # No-op after a normal close; drops the queue on Ctrl-C
+        result_sink.close()
+        if columnar_sink is not None:
+            columnar_sink.close()
+            print(f"Columnar results saved to '{columnar_sink.path}'.")
+        if database is not None:
+            database.close()
@@ -0,0 +1,146 @@
+# scan_result_database.py
+import csv
+import os
+import sqlite3
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from data_and_error_logging import RESULT_FIELDNAMES, format_result_row
+
+COMMIT_EVERY_ROWS: int = 200             # Batch inserts into one transaction instead of an fsync per file
+SETTING_COLUMNS = ("frame_size", "step", "adaptive")   # Analysis settings a stored result is only reused under
+
+FileSignature = Tuple[int, int, Optional[str]]   # (size_bytes, mtime_ns, streaminfo_md5 or None)
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+def read_streaminfo_md5(file_path: str) -> Optional[str]:
+    # The encoder's MD5 of the decoded audio, stored in the FLAC header; 0 means "not computed"
+    try:
+        from mutagen.flac import FLAC
+        md5 = FLAC(file_path).info.md5_signature
+    except Exception:
+        return None
+    return f"{md5:032x}" if md5 else None
+
+def _path_key(file_path: str) -> str:
+    # Absolute, like fingerprint and PCM cache keys: relative scans and other working directories hit the same rows
+    return os.path.abspath(file_path)
+
+def file_signature(file_path: str, use_streaminfo_md5: bool = False) -> FileSignature:
+    stat = os.stat(file_path)
+    md5 = read_streaminfo_md5(file_path) if use_streaminfo_md5 else None
+    return stat.st_size, stat.st_mtime_ns, md5
+
+class ScanResultDatabase:
+    """
+    Local SQLite store of scan results, keyed by absolute path and validated by file size, mtime and
+    (optionally) the FLAC STREAMINFO MD5. A stored result is only reused while all of them match and
+    it was analyzed with this database's settings (frame geometry, resolved per sample rate like the
+    analysis does, adaptive sampling and the result's channel_mode); it comes back with the path as given to lookup().
+    Rows use the RESULT_FIELDNAMES schema, so they can be exported back to the usual CSV.
+    """
+
+    def __init__(self, db_path: str, fieldnames: Iterable[str] = RESULT_FIELDNAMES,
+                 frame_size: Optional[int] = None, step: Optional[int] = None, adaptive: bool = False,
+                 channel_mode: str = "first"):
+        parent_dir = os.path.dirname(os.path.abspath(db_path))
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        self.fieldnames = [k for k in fieldnames if k != "path"]
+        self.connection = sqlite3.connect(db_path)
+        self.pending_rows = 0
+        self.frame_size, self.step = frame_size, step
+        self.adaptive = int(bool(adaptive))
+        self.channel_mode = channel_mode
+
+        columns = ", ".join(f"{_quote(k)}" for k in self.fieldnames)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS scan_results ("
+            f"path TEXT PRIMARY KEY, size_bytes INTEGER, mtime_ns INTEGER, streaminfo_md5 TEXT, "
+            f"scanned_at TEXT, frame_size INTEGER, step INTEGER, adaptive INTEGER, {columns})"
+        )
+        # Databases created before a schema column was added get it appended (empty for old rows, which
+        # therefore never match the settings and are re-analyzed once)
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(scan_results)")}
+        for column in [*SETTING_COLUMNS, *self.fieldnames]:
+            if column not in existing:
+                self.connection.execute(f"ALTER TABLE scan_results ADD COLUMN {_quote(column)}")
+        self.connection.commit()
+
+    def _geometry(self, samplerate) -> Optional[Tuple[int, int]]:
+        # (frame_size, step) the analysis used at this rate, so "no option" and the explicit default hit the same rows
+        from audio_frame_analysis import frame_geometry
+        try:
+            return frame_geometry(int(samplerate), self.frame_size, self.step)
+        except (TypeError, ValueError):
+            return None
+
+    def lookup(self, file_path: str, signature: FileSignature) -> Optional[Dict[str, Any]]:
+        """Return the stored result for file_path if the file is unchanged and was analyzed with these settings, else None."""
+        size_bytes, mtime_ns, md5 = signature
+        columns = ", ".join(_quote(k) for k in [*SETTING_COLUMNS, *self.fieldnames])
+        row = self.connection.execute(
+            f"SELECT size_bytes, mtime_ns, streaminfo_md5, {columns} FROM scan_results WHERE path = ?",
+            (_path_key(file_path),),
+        ).fetchone()
+        if row is None or row[0] != size_bytes or row[1] != mtime_ns:
+            return None
+        if md5 is not None and row[2] != md5:
+            return None
+        stored_frame_size, stored_step, stored_adaptive = row[3:6]
+        result = {"path": file_path}
+        result.update({k: ("" if v is None else v) for k, v in zip(self.fieldnames, row[6:])})
+        if stored_adaptive != self.adaptive or result.get("channel_mode") != self.channel_mode:
+            return None                                # e.g. first-channel verdicts have no per-channel columns
+        if self._geometry(result.get("samplerate_hz")) != (stored_frame_size, stored_step):
+            return None
+        return result
+
+    def store(self, result: Dict[str, Any], signature: FileSignature) -> None:
+        size_bytes, mtime_ns, md5 = signature
+        frame_size, step = self._geometry(result.get("samplerate_hz")) or (None, None)
+        columns = ["path", "size_bytes", "mtime_ns", "streaminfo_md5", "scanned_at", *SETTING_COLUMNS, *self.fieldnames]
+        values = [_path_key(result["path"]), size_bytes, mtime_ns, md5, datetime.now().isoformat(timespec="seconds"),
+                  frame_size, step, self.adaptive]
+        values += [result.get(k, "") for k in self.fieldnames]
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO scan_results ({', '.join(_quote(c) for c in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            values,
+        )
+        self.pending_rows += 1
+        if self.pending_rows >= COMMIT_EVERY_ROWS:
+            self.commit()
+
+    def commit(self) -> None:
+        self.connection.commit()
+        self.pending_rows = 0
+
+    def export_csv(self, csv_path: str) -> int:
+        """Write every stored result to csv_path in the RESULT_FIELDNAMES schema; returns the row count."""
+        fieldnames = ["path", *self.fieldnames]
+        rows = self.connection.execute(
+            f"SELECT {', '.join(_quote(k) for k in fieldnames)} FROM scan_results ORDER BY path"
+        )
+        count = 0
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL)
+            writer.writeheader()
+            for row in rows:
+                result = {k: ("" if v is None else v) for k, v in zip(fieldnames, row)}
+                writer.writerow(format_result_row(result, fieldnames))
+                count += 1
+        return count
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
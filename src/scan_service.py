@@ -0,0 +1,273 @@
+# scan_service.py
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from batch_executors import default_job_count
+from data_and_error_logging import RESULT_FIELDNAMES
+from file_discovery import FileDiscovery
+
+SERVICE_DEFAULT_HOST: str = "127.0.0.1"  # Local only by default: the API has no authentication
+SERVICE_DEFAULT_PORT: int = 8765
+MAX_REQUEST_BODY_BYTES: int = 1024 * 1024
+MAX_RESULTS_PER_PAGE: int = 1000
+
+HTTP_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+@dataclass
+class ScanJob:
+    job_id: int
+    path: str
+    priority: int                        # Lower runs first; equal priorities run in submission order
+    options: Dict[str, Any]
+    created_at: float = field(default_factory=time.time)
+    status: str = "discovering"          # discovering -> queued -> running -> done | cancelled
+    num_files: int = 0
+    num_done: int = 0
+    num_errors: int = 0
+    results: List[Dict[str, Any]] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "path": self.path,
+            "priority": self.priority,
+            "options": self.options,
+            "status": self.status,
+            "created_at": self.created_at,
+            "num_files": self.num_files,
+            "num_done": self.num_done,
+            "num_errors": self.num_errors,
+        }
+
+def _result_row(result: Dict[str, Any]) -> Dict[str, Any]:
+    # The CSV schema only (no per-frame arrays), with JSON-native values
+    row = {}
+    for k in RESULT_FIELDNAMES:
+        value = result.get(k, "")
+        row[k] = value.item() if hasattr(value, "item") else value
+    return row
+
+class ScanService:
+    """
+    Long-running scan service: jobs (a .flac file or a folder) are submitted over a local HTTP/JSON API,
+    their files queued by priority, and analyzed by run_single_file() (via _run_batch_task) in a warm
+    executor, so imports and worker start-up are paid once rather than per call.
+
+    Endpoints:
+      GET    /health
+      POST   /jobs                 {"path": ..., "priority": 0, "streaming": false, "adaptive": false}
+      GET    /jobs                 summaries of every job
+      GET    /jobs/<id>            one job's summary (status and counts)
+      GET    /jobs/<id>/results    ?offset=0&limit=1000 -> {"fieldnames": RESULT_FIELDNAMES, "results": [...]}
+      DELETE /jobs/<id>            cancel the job's files that have not started yet
+    """
+
+    def __init__(self, jobs: Optional[int] = None, backend: str = "process") -> None:
+        self.jobs = jobs or default_job_count()
+        self.backend = backend
+        self.scan_jobs: Dict[int, ScanJob] = {}
+        self.job_ids = itertools.count(1)
+        self.sequence = itertools.count()        # FIFO tie-break within a priority
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.executor = None
+        self.crash_suspects = set()              # (job_id, file_path) in flight when a pool broke; rerun alone
+
+    def _new_executor(self, max_workers: Optional[int] = None):
+        if self.backend == "thread":
+            return ThreadPoolExecutor(max_workers=max_workers or self.jobs, thread_name_prefix="flac-scan")
+        return ProcessPoolExecutor(max_workers=max_workers or self.jobs)
+
+    def _replace_executor(self, broken) -> None:
+        # Every coroutine with a file on the broken pool gets here; only the first one replaces it
+        if self.executor is broken:
+            self.executor = self._new_executor()
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    # --- Scheduling ---
+
+    async def _discover(self, job: ScanJob) -> None:
+        if os.path.isfile(job.path):
+            file_paths = [job.path]
+        else:
+            file_paths = await asyncio.to_thread(lambda: list(FileDiscovery(job.path)))
+        if job.status == "cancelled":
+            return
+        job.num_files = len(file_paths)
+        job.status = "queued" if file_paths else "done"
+        for file_path in file_paths:
+            self.queue.put_nowait((job.priority, next(self.sequence), job.job_id, file_path))
+
+    async def _worker(self) -> None:
+        from run_modes import _run_batch_task        # The analysis stack loads here, after the server is listening
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job_id, file_path = await self.queue.get()
+            job = self.scan_jobs[job_id]
+            try:
+                if job.status == "cancelled":
+                    continue
+                job.status = "running"
+                task = partial(_run_batch_task, file_path, streaming=job.options["streaming"],
+                               adaptive=job.options["adaptive"])
+                # A crash suspect runs on a pool of its own, so a second crash is attributable to exactly this file
+                suspect = (job_id, file_path) in self.crash_suspects
+                executor = self._new_executor(max_workers=1) if suspect else self.executor
+                try:
+                    result = await loop.run_in_executor(executor, task)
+                except BrokenProcessPool:
+                    if not suspect:
+                        # A crashed worker breaks the pool for every file in flight: start a fresh pool and
+                        # requeue this file as a suspect instead of blaming it
+                        self._replace_executor(executor)
+                        self.crash_suspects.add((job_id, file_path))
+                        self.queue.put_nowait((job.priority, next(self.sequence), job_id, file_path))
+                        continue
+                    result = {"path": file_path, "status": "ERROR (worker crashed)"}
+                except Exception:
+                    result = {"path": file_path, "status": "ERROR"}
+                finally:
+                    if suspect:
+                        self.crash_suspects.discard((job_id, file_path))
+                        executor.shutdown(wait=False, cancel_futures=True)
+                job.results.append(_result_row(result))
+                job.num_done += 1
+                if str(result.get("status", "")).startswith("ERROR"):
+                    job.num_errors += 1
+                if job.num_done == job.num_files:
+                    job.status = "done"
+            finally:
+                self.queue.task_done()
+
+    # --- HTTP ---
+
+    def _route(self, method: str, target: str, body: Any) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok", "workers": self.jobs, "queued_files": self.queue.qsize()}
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                return 200, [job.summary() for job in self.scan_jobs.values()]
+            if method == "POST":
+                return self._submit(body)
+            return 405, {"error": "use GET or POST"}
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.scan_jobs.get(int(parts[1])) if parts[1].isdigit() else None
+            if job is None:
+                return 404, {"error": f"no job {parts[1]}"}
+            if len(parts) == 2 and method == "GET":
+                return 200, job.summary()
+            if len(parts) == 2 and method == "DELETE":
+                if job.status != "done":
+                    job.status = "cancelled"
+                return 200, job.summary()
+            if parts[2:] == ["results"] and method == "GET":
+                query = parse_qs(url.query)
+                offset = max(0, int(query.get("offset", ["0"])[0]))
+                limit = min(MAX_RESULTS_PER_PAGE, max(0, int(query.get("limit", [str(MAX_RESULTS_PER_PAGE)])[0])))
+                return 200, {
+                    **job.summary(),
+                    "fieldnames": RESULT_FIELDNAMES,
+                    "offset": offset,
+                    "results": job.results[offset:offset + limit],
+                }
+            return 405, {"error": "unsupported method for this resource"}
+
+        return 404, {"error": "unknown endpoint"}
+
+    def _submit(self, body: Any) -> Tuple[int, Any]:
+        if not isinstance(body, dict) or not isinstance(body.get("path"), str):
+            return 400, {"error": "expected a JSON object with a 'path' string"}
+        path = body["path"]
+        if not (os.path.isdir(path) or (os.path.isfile(path) and path.lower().endswith(".flac"))):
+            return 400, {"error": "path is neither a folder nor a .flac file"}
+        try:
+            priority = int(body.get("priority", 0))
+        except (TypeError, ValueError):
+            return 400, {"error": "priority must be an integer"}
+
+        options = {"streaming": bool(body.get("streaming", False)), "adaptive": bool(body.get("adaptive", False))}
+        job = ScanJob(job_id=next(self.job_ids), path=path, priority=priority, options=options)
+        self.scan_jobs[job.job_id] = job
+        asyncio.get_running_loop().create_task(self._discover(job))
+        return 202, job.summary()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        status, payload = 500, {"error": "internal error"}
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            if len(request_line) != 3:
+                status, payload = 400, {"error": "malformed request line"}
+            else:
+                method, target, _ = request_line
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_REQUEST_BODY_BYTES:
+                    status, payload = 413, {"error": "request body too large"}
+                else:
+                    raw_body = await reader.readexactly(length) if length else b""
+                    try:
+                        body = json.loads(raw_body) if raw_body else None
+                    except ValueError:
+                        status, payload = 400, {"error": "body is not valid JSON"}
+                    else:
+                        status, payload = self._route(method.upper(), target, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "malformed request"}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+
+        data = json.dumps(payload, default=str).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: Optional[str] = None, port: Optional[int] = None) -> None:
+        host = host or SERVICE_DEFAULT_HOST
+        port = port or SERVICE_DEFAULT_PORT
+        self.queue = asyncio.PriorityQueue()
+        self.executor = self._new_executor()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.jobs)]
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"Scan service listening on http://{host}:{port} with {self.jobs} {self.backend} workers (Ctrl-C to stop).")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+def run_service(host: Optional[str] = None, port: Optional[int] = None, jobs: Optional[int] = None,
+                backend: str = "process") -> None:
+    try:
+        asyncio.run(ScanService(jobs=jobs, backend=backend).serve(host, port))
+    except KeyboardInterrupt:
+        print("Scan service stopped.")
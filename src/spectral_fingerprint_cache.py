@@ -0,0 +1,93 @@
+# spectral_fingerprint_cache.py
+import hashlib
+import os
+
+import numpy as np
+
+from audio_frame_analysis import CumulativeEnergyCache, frame_geometry
+
+FINGERPRINT_GRID_STEP_HZ: float = 250.0  # Resolution of re-tunable cutoffs (every current cutoff sits on this grid)
+FINGERPRINT_VERSION: int = 2             # Bump when the stored layout changes; older fingerprints are then ignored
+FINGERPRINT_SUFFIX: str = ".npz"
+
+def fingerprint_grid(samplerate, extra_freqs_hz=()):
+    """Frequencies stored per frame: a fixed grid up to Nyquist plus any cutoff that must stay exact."""
+    grid = np.arange(0.0, samplerate / 2.0, FINGERPRINT_GRID_STEP_HZ)
+    return np.unique(np.concatenate([grid, np.asarray(extra_freqs_hz, dtype=np.float64)]))
+
+def fingerprint_path(cache_dir, file_path):
+    # One file per source, named by a hash of its absolute path so any folder layout maps to a flat directory
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest + FINGERPRINT_SUFFIX)
+
+def save_fingerprint(cache_dir, file_path, energy_cache, samplerate, num_samples, frame_size=None, step=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(file_path)
+    frame_size, step = frame_geometry(samplerate, frame_size, step)
+    out_path = fingerprint_path(cache_dir, file_path)
+    tmp_path = out_path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:                  # Uncompressed, so every array can be read without inflating
+        np.savez(
+            f,
+            version=FINGERPRINT_VERSION,
+            source_path=os.path.abspath(file_path),
+            source_size=stat.st_size,
+            source_mtime_ns=stat.st_mtime_ns,
+            samplerate=samplerate,
+            num_samples=num_samples,
+            frame_size=frame_size,
+            step=step,
+            freqs_hz=energy_cache.freqs_hz,
+            energy_above=energy_cache.energy_above.astype(np.float32, copy=False),
+            total_energy=energy_cache.total_energy,
+        )
+    os.replace(tmp_path, out_path)                   # Atomic, so parallel workers never see a half-written file
+    return out_path
+
+def load_fingerprint(path):
+    """Returns (CumulativeEnergyCache, metadata dict), or (None, None) if unreadable or from another version."""
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            if int(stored["version"]) != FINGERPRINT_VERSION:
+                return None, None
+            energy_cache = CumulativeEnergyCache(
+                freqs_hz=stored["freqs_hz"],
+                energy_above=stored["energy_above"],
+                total_energy=stored["total_energy"],
+            )
+            metadata = {
+                "source_path": str(stored["source_path"]),
+                "source_size": int(stored["source_size"]),
+                "source_mtime_ns": int(stored["source_mtime_ns"]),
+                "samplerate": int(stored["samplerate"]),
+                "num_samples": int(stored["num_samples"]),
+                "frame_size": int(stored["frame_size"]),
+                "step": int(stored["step"]),
+            }
+        return energy_cache, metadata
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+def load_current_fingerprint(cache_dir, file_path, frame_size=None, step=None):
+    """
+    Like load_fingerprint(), but only if the source file is unchanged since the fingerprint was made and
+    its frames have the requested geometry (frame_geometry() of frame_size / step).
+    """
+    path = fingerprint_path(cache_dir, file_path)
+    if not os.path.isfile(path):
+        return None, None
+    energy_cache, metadata = load_fingerprint(path)
+    if metadata is None:
+        return None, None
+    stat = os.stat(file_path)
+    if metadata["source_size"] != stat.st_size or metadata["source_mtime_ns"] != stat.st_mtime_ns:
+        return None, None
+    if (metadata["frame_size"], metadata["step"]) != frame_geometry(metadata["samplerate"], frame_size, step):
+        return None, None
+    return energy_cache, metadata
+
+def iter_fingerprint_paths(cache_dir):
+    with os.scandir(cache_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(FINGERPRINT_SUFFIX):
+                yield entry.path
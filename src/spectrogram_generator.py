@@ -1,9 +1,27 @@
 # spectrogram_generator.py
+import os
 import shutil
 import subprocess
+import threading
+import numpy as np
+
+from functools import lru_cache
 from pathlib import Path
+from audio_frame_analysis import analyze_frames, calculate_effective_cutoff, divide_into_frames, frame_count, frame_geometry
+from audio_loader import load_flac
+
+SPECTROGRAM_ENGINES = ("native", "ffmpeg")   # native: rendered in-process from the analysis spectra; ffmpeg: showspectrumpic
+SPECTROGRAM_SIZE_PX = (3840, 2160)           # 4K UHD output, both engines
+SPECTROGRAM_DPI: int = 200
+SPECTROGRAM_FREQ_ROWS: int = 2048            # Frequency bands the native engine draws (at most one per cached FFT bin)
+SPECTROGRAM_DRANGE_DB: float = 120.0         # Dynamic range shown below the loudest band, as ffmpeg's drange=120
+SPECTROGRAM_CONFIDENCE_BELOW: float = 0.6    # Batch mode: files classified with less confidence than this get a spectrogram
+SPECTROGRAM_WORKERS: int = 1                 # Batch mode: render processes, i.e. the cap on concurrent renders
+SPECTROGRAM_MAX_QUEUED: int = 64             # Batch mode: queued renders holding band data; later ones re-analyze in the worker
 
+@lru_cache(maxsize=None)
 def ffmpeg_works() -> bool:
+    # Probed once per process: batch workers rendering many spectrograms spawn `ffmpeg -version` only once
     if not shutil.which("ffmpeg"):
         return False
     try:
@@ -17,14 +35,94 @@ def ffmpeg_works() -> bool:
     except OSError:
         return False
 
-def spectrogram_for_flac(file_path):
+def band_magnitudes(energy_cache, num_bands=SPECTROGRAM_FREQ_ROWS):
+    """
+    (frames, bands) spectral magnitude per equal-width band, from a CumulativeEnergyCache: the energy
+    above each band edge, interpolated between cached frequencies, differenced. Exact at full FFT
+    resolution; coarser caches (streaming, fingerprints, per-channel) give a smoothed, lower-resolution
+    picture. Returns (edges_hz, magnitudes).
+    """
+    freqs_hz = energy_cache.freqs_hz
+    num_bands = max(1, min(num_bands, len(freqs_hz) - 1))
+    edges_hz = np.linspace(freqs_hz[0], freqs_hz[-1], num_bands + 1)
+
+    # Linear interpolation weights shared by every frame: one gather instead of a per-frame np.interp
+    upper = np.clip(np.searchsorted(freqs_hz, edges_hz, side="left"), 1, len(freqs_hz) - 1)
+    lower = upper - 1
+    weight = (edges_hz - freqs_hz[lower]) / (freqs_hz[upper] - freqs_hz[lower])
+    # Gathered before widening: only the edge columns are ever copied to float64, not the whole cache
+    energy_above = energy_cache.energy_above
+    above_edges = energy_above[:, lower].astype(np.float64) * (1.0 - weight) + energy_above[:, upper].astype(np.float64) * weight
+    return edges_hz, np.maximum(above_edges[:, :-1] - above_edges[:, 1:], 0.0)
+
+def _covers_track(analysis, frame_size=None, step=None):
+    # An adaptive sample holds only some frames; anything else has one cache row per frame of the track
+    _, energy_cache, samplerate, num_samples, _ = analysis
+    return len(energy_cache.total_energy) == frame_count(num_samples, *frame_geometry(samplerate, frame_size, step))
+
+def spectrogram_analysis(analysis, frame_size=None, step=None):
+    """
+    The part of an analysis tuple the native engine draws from, with the cache reduced to the
+    SPECTROGRAM_FREQ_ROWS band edges (a few MB for a typical track), so it is cheap to hand to a render
+    worker. None for an adaptive sample, which the renderer has to re-analyze anyway.
+    """
+    if not _covers_track(analysis, frame_size, step):
+        return None
+    _, energy_cache, samplerate, num_samples, _ = analysis
+    freqs_hz = energy_cache.freqs_hz
+    if len(freqs_hz) > SPECTROGRAM_FREQ_ROWS + 1:
+        energy_cache = energy_cache.at_freqs(np.linspace(freqs_hz[0], freqs_hz[-1], SPECTROGRAM_FREQ_ROWS + 1))
+    return None, energy_cache, samplerate, num_samples, None
+
+def needs_spectrogram(status, confidence, confidence_below=SPECTROGRAM_CONFIDENCE_BELOW):
+    # Inconclusive files and low-confidence verdicts; errors and empty files have nothing to draw
+    status = str(status)
+    if status.startswith("ERROR") or status == "No audio data.":
+        return False
+    return status.startswith("Inconclusive") or float(confidence) < confidence_below
+
+def render_spectrogram(energy_cache, samplerate, num_samples, out_path, title=""):
+    """
+    Write a PNG spectrogram of an analyzed file without decoding it again: the analysis FFT already
+    holds every frame's spectrum (as cumulative energies). Uses the Agg canvas directly, never pyplot,
+    so concurrent renders in threads or worker processes share no global figure state.
+    """
+    # Imported here: only runs that draw a spectrogram pay for matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    edges_hz, magnitudes = band_magnitudes(energy_cache)
+    peak = float(magnitudes.max()) if magnitudes.size else 0.0
+    floor = 10.0 ** (-SPECTROGRAM_DRANGE_DB / 20.0)
+    levels_db = 20.0 * np.log10(np.maximum(magnitudes / peak if peak > 0.0 else magnitudes, floor))
+
+    w, h = SPECTROGRAM_SIZE_PX
+    figure = Figure(figsize=(w / SPECTROGRAM_DPI, h / SPECTROGRAM_DPI), dpi=SPECTROGRAM_DPI)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    image = axes.imshow(
+        levels_db.T if levels_db.size else np.full((1, 1), -SPECTROGRAM_DRANGE_DB),
+        origin="lower",
+        aspect="auto",
+        interpolation="nearest",
+        cmap="inferno",
+        vmin=-SPECTROGRAM_DRANGE_DB,
+        vmax=0.0,
+        extent=(0.0, num_samples / samplerate, edges_hz[0], edges_hz[-1]),
+    )
+    axes.set_xlabel("Time (s)")
+    axes.set_ylabel("Frequency (Hz)")
+    axes.set_title(title)
+    figure.colorbar(image, ax=axes, label="dB")
+    figure.savefig(out_path)
+    return out_path
+
+def _spectrogram_with_ffmpeg(in_path, out):
     if not ffmpeg_works():
         print("FFmpeg not detected or not runnable. Please install it and ensure it's in PATH.")
         return None
 
-    in_path = Path(file_path)
-    out = in_path.with_suffix(".png")
-    w, h = 3840, 2160 # 4K UHD output
+    w, h = SPECTROGRAM_SIZE_PX
 
     lavfi = (
         f"showspectrumpic=s={w}x{h}:legend=1:"
@@ -48,4 +146,102 @@ def spectrogram_for_flac(file_path):
     ]
 
     subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    return out
\ No newline at end of file
+    return out
+
+def spectrogram_for_flac(file_path, engine="native", analysis=None, out_path=None, pcm_cache=None, frame_size=None, step=None,
+                         channel=None):
+    """
+    Write out_path (default: <file>.png next to the FLAC file) and return its path (None if it could
+    not be drawn).
+
+    engine: "native" renders from analysis, the (ratios, energy_cache, samplerate, num_samples,
+            effective_cutoff_hz) tuple the analysis just produced; without one (or with an adaptive
+            sample, which does not cover the whole track) the file is decoded and analyzed once here.
+            "ffmpeg" spawns ffmpeg's showspectrumpic, which decodes the file itself.
+    pcm_cache: a DecodedPcmCache to take the samples from when the native engine has to re-analyze.
+    frame_size / step: the geometry the analysis used (frame_geometry() defaults when None).
+    channel: per-channel runs pass the index of the channel that decided the verdict (analysis is then
+             that channel's); it is named in the title and re-analyzed instead of the first channel.
+             ffmpeg always draws every channel.
+    """
+    in_path = Path(file_path)
+    out = in_path.with_suffix(".png") if out_path is None else Path(out_path)
+    if engine == "ffmpeg":
+        return _spectrogram_with_ffmpeg(in_path, out)
+
+    if analysis is not None and _covers_track(analysis, frame_size, step):
+        _, energy_cache, samplerate, num_samples, _ = analysis
+    else:
+        load = load_flac if pcm_cache is None else pcm_cache.load_flac
+        data, samplerate = load(file_path, channels=[channel or 0])
+        if data is None:
+            return None
+        num_samples = len(data)
+        frames = divide_into_frames(data, *frame_geometry(samplerate, frame_size, step))
+        _, energy_cache = analyze_frames(frames, samplerate, calculate_effective_cutoff(samplerate))
+    title = in_path.name if channel is None else f"{in_path.name} (channel {channel + 1})"
+    return render_spectrogram(energy_cache, samplerate, num_samples, out, title=title)
+
+class BatchSpectrogramRenderer:
+    """
+    Renders batch-mode spectrograms on its own small process pool, off the analysis critical path:
+
+        renderer = BatchSpectrogramRenderer(folder_path, out_dir)
+        renderer.submit(result)        # never blocks; no-op unless the result carries "spectrogram_analysis"
+        renderer.close()
+
+    Each PNG lands at out_dir/<path relative to folder_path>.png, mirroring the scanned tree. At most
+    `workers` renders run at once; the rest wait in the pool's queue. Past `max_queued` waiting renders
+    only the path is queued and the worker re-analyzes the file, so a backlog never holds more than
+    max_queued band matrices in memory.
+    """
+
+    def __init__(self, folder_path, out_dir, engine="native", workers=SPECTROGRAM_WORKERS, max_queued=SPECTROGRAM_MAX_QUEUED,
+                 pcm_cache=None, frame_size=None, step=None):
+        from concurrent.futures import ProcessPoolExecutor   # Imported here: single-file runs never start a pool
+        self.folder_path = folder_path
+        self.out_dir = out_dir
+        self.engine = engine
+        self.max_queued = max_queued
+        self.pcm_cache = pcm_cache                   # Used by path-only renders, which re-analyze the file
+        self.frame_size = frame_size
+        self.step = step
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()                 # Done callbacks run on the executor's management thread
+        self.num_pending = 0
+        self.num_rendered = 0
+        self.num_failed = 0
+
+    def out_path(self, file_path):
+        relative = os.path.relpath(file_path, self.folder_path)
+        return os.path.join(self.out_dir, os.path.splitext(relative)[0] + ".png")
+
+    def submit(self, result):
+        if "spectrogram_analysis" not in result:
+            return
+        analysis = result.pop("spectrogram_analysis")
+        with self.lock:
+            if self.num_pending >= self.max_queued:
+                analysis = None
+            self.num_pending += 1
+        future = self.executor.submit(_render_batch_spectrogram, result["path"], self.out_path(result["path"]),
+                                      self.engine, analysis, self.pcm_cache, self.frame_size, self.step,
+                                      result.get("verdict_channel"))
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self.lock:
+            self.num_pending -= 1
+            if not future.cancelled() and future.exception() is None and future.result() is not None:
+                self.num_rendered += 1
+            else:
+                self.num_failed += 1
+
+    def close(self, cancel=False):
+        # Waits for the queued renders, or drops them (cancel=True, e.g. on Ctrl-C)
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+
+def _render_batch_spectrogram(file_path, out_path, engine, analysis, pcm_cache=None, frame_size=None, step=None,
+                              channel=None):
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    return spectrogram_for_flac(file_path, engine, analysis, out_path, pcm_cache, frame_size, step, channel)
@@ -0,0 +1,116 @@
+# stage_instrumentation.py
+import time
+import tracemalloc
+
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, List
+
+INSTRUMENTED_STAGES = ("read", "decode", "analyze", "classify", "fingerprint", "spectrogram")
+STAGE_METRICS = ("wall_s", "cpu_s", "peak_mb")
+STAGE_FIELDNAMES = [f"{stage}_{metric}" for stage in INSTRUMENTED_STAGES for metric in STAGE_METRICS]
+
+HISTOGRAM_BUCKETS_S = (0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0)   # Upper bucket edges; the last bucket is open
+HISTOGRAM_BAR_WIDTH: int = 40
+
+_NO_STAGE = nullcontext()                # Shared by every disabled recorder: stage() then costs one attribute check
+
+class StageRecorder:
+    """
+    Per-file wall time, CPU time and peak traced allocation of each analysis stage:
+
+        recorder = StageRecorder(enabled=instrument)
+        with recorder.stage("decode"):
+            ...
+        result.update(recorder.fields())
+
+    A disabled recorder measures nothing and fields() is empty, so results keep the usual schema.
+    CPU time is the calling thread's (time.thread_time), so it stays per-file under thread workers
+    and across pipeline stages. Peak memory comes from tracemalloc, which an enabled recorder starts
+    in its process; it is process-wide, so with several files analyzed concurrently in one process
+    (thread backend, --pipeline) the peaks are approximate. A stage entered twice accumulates its
+    times and keeps the larger peak.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.stages: Dict[str, List[float]] = {}     # stage -> [wall_s, cpu_s, peak_bytes]
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NO_STAGE
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start_wall, time.thread_time() - start_cpu
+            peak = max(0, tracemalloc.get_traced_memory()[1] - start_bytes)
+            totals = self.stages.setdefault(name, [0.0, 0.0, 0])
+            totals[0] += wall
+            totals[1] += cpu
+            totals[2] = max(totals[2], peak)
+
+    def fields(self) -> Dict[str, Any]:
+        # STAGE_FIELDNAMES columns; stages this file never went through stay empty
+        if not self.enabled:
+            return {}
+        fields = {k: "" for k in STAGE_FIELDNAMES}
+        for name, (wall, cpu, peak) in self.stages.items():
+            fields[f"{name}_wall_s"] = round(wall, 6)
+            fields[f"{name}_cpu_s"] = round(cpu, 6)
+            fields[f"{name}_peak_mb"] = round(peak / (1024 * 1024), 3)
+        return fields
+
+NO_INSTRUMENTATION = StageRecorder(enabled=False)
+
+def _bucket_label(index: int) -> str:
+    if index == len(HISTOGRAM_BUCKETS_S):
+        return f">= {HISTOGRAM_BUCKETS_S[-1]:g} s"
+    return f"< {HISTOGRAM_BUCKETS_S[index]:g} s"
+
+def print_stage_summary(results: Iterable[Dict[str, Any]]) -> None:
+    """
+    End-of-batch report over instrumented results: per stage, the total / mean / worst wall time,
+    CPU share and largest peak, then a histogram of per-file wall times, to size workers and spot
+    pathological files. Results without stage columns (errors, database hits) are skipped.
+    """
+    per_stage = {stage: [] for stage in INSTRUMENTED_STAGES}     # stage -> [(wall_s, cpu_s, peak_mb, path)]
+    for result in results:
+        for stage in INSTRUMENTED_STAGES:
+            wall = result.get(f"{stage}_wall_s", "")
+            if wall == "":
+                continue
+            per_stage[stage].append((float(wall), float(result[f"{stage}_cpu_s"]), float(result[f"{stage}_peak_mb"]),
+                                     result.get("path", "")))
+
+    per_stage = {stage: rows for stage, rows in per_stage.items() if rows}
+    if not per_stage:
+        return
+    total_wall = sum(row[0] for rows in per_stage.values() for row in rows)
+
+    print("\nPer-stage timing (wall / CPU time per file, peak traced allocation):")
+    print(f"  {'stage':<12} {'files':>6} {'total s':>9} {'share':>6} {'mean s':>8} {'max s':>8} {'cpu/wall':>8} {'peak MB':>8}")
+    for stage, rows in per_stage.items():
+        walls = [row[0] for row in rows]
+        stage_wall = sum(walls)
+        cpu_ratio = sum(row[1] for row in rows) / stage_wall if stage_wall > 0 else 0.0
+        print(f"  {stage:<12} {len(rows):6d} {stage_wall:9.2f} {stage_wall / total_wall if total_wall else 0:6.1%} "
+              f"{stage_wall / len(rows):8.3f} {max(walls):8.3f} {cpu_ratio:8.2f} {max(row[2] for row in rows):8.1f}")
+
+    for stage, rows in per_stage.items():
+        counts = [0] * (len(HISTOGRAM_BUCKETS_S) + 1)
+        for wall, *_ in rows:
+            counts[next((i for i, edge in enumerate(HISTOGRAM_BUCKETS_S) if wall < edge), len(HISTOGRAM_BUCKETS_S))] += 1
+        slowest = max(rows, key=lambda row: row[0])
+        print(f"\n  {stage} wall time per file (slowest: {slowest[0]:.2f} s, {slowest[3]}):")
+        scale = HISTOGRAM_BAR_WIDTH / max(counts)
+        for i, count in enumerate(counts):
+            if count:
+                print(f"    {_bucket_label(i):>9} | {'#' * max(1, round(count * scale)):<{HISTOGRAM_BAR_WIDTH}} {count}")
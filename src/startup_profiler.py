@@ -0,0 +1,70 @@
+# startup_profiler.py
+import sys
+import time
+
+from importlib.abc import MetaPathFinder
+from typing import List, Tuple
+
+STARTUP_PROFILE_TOP_MODULES: int = 25    # Rows printed by report(), slowest cumulative first
+
+class ImportTimer(MetaPathFinder):
+    """
+    Meta path hook recording how long every module imported after install() takes to execute,
+    like `python -X importtime` but switchable from the command line (--profile-startup) and covering
+    the lazy imports of whichever code path actually ran.
+
+    records holds (module, self_s, cumulative_s); cumulative includes the modules it imported itself.
+    Only module execution is timed, not locating the file, so totals run slightly under -X importtime.
+    """
+
+    def __init__(self) -> None:
+        self.records: List[Tuple[str, float, float]] = []
+        self.child_time: List[float] = []        # Stack: time spent in nested imports of each module being executed
+        self.started_at = time.perf_counter()
+
+    def install(self) -> "ImportTimer":
+        sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # Builtin/frozen importers are shared classes, not per-module loaders: leave them alone (they are tiny)
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, fullname, exec_module):
+        def timed_exec_module(module):
+            self.child_time.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                cumulative = time.perf_counter() - start
+                nested = self.child_time.pop()
+                if self.child_time:
+                    self.child_time[-1] += cumulative
+                self.records.append((fullname, cumulative - nested, cumulative))
+        return timed_exec_module
+
+    def report(self, top=STARTUP_PROFILE_TOP_MODULES, file=None) -> None:
+        file = file or sys.stderr
+        total = sum(self_s for _, self_s, _ in self.records)
+        elapsed = time.perf_counter() - self.started_at
+        print(f"\nStartup profile: {len(self.records)} modules imported in {total * 1000:.1f} ms "
+              f"({elapsed * 1000:.1f} ms since start-up profiling began)", file=file)
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module", file=file)
+        for name, self_s, cumulative in sorted(self.records, key=lambda r: r[2], reverse=True)[:top]:
+            print(f"{cumulative * 1000:14.1f} {self_s * 1000:9.1f}  {name}", file=file)
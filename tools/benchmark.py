@@ -0,0 +1,360 @@
+# tools/benchmark.py
+"""
+Benchmark suite for the analysis hot paths, on a deterministic synthetic FLAC corpus.
+
+The corpus is generated locally (and cached between runs): full-band white noise and a music-like
+signal (harmonic notes over pink noise), each also brick-wall low-passed at every LOSSY_CUTOFF_PROFILES
+cutoff to simulate a lossy upscale, at several sample rates and durations. Every run measures, per
+stage, the best of --repeat timings and (in a separate, untimed pass) the tracemalloc peak:
+
+  decode            load_flac()                             MB/s of FLAC, Msamples/s
+  divide_frames     divide_into_frames()                    frames/s
+  analyze_frame     analyze_frame(), per frame (legacy)     frames/s
+  analyze_frames    analyze_frames(), batched rFFT          frames/s, MB/s of PCM
+  active_fractions  _active_fractions_from_cache()          frames/s
+  classify          determine_file_status()                 files/s
+  end_to_end        run_single_file() (in-memory, streaming)  files/s
+
+Usage:
+  python tools/benchmark.py [--quick] [--output results.json] [--baseline baseline.json] [--tolerance 0.10]
+
+With --baseline, each throughput that drops (or peak memory that grows) by more than --tolerance is
+reported as a regression and the exit status is 1.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+SRC_DIR = REPO_DIR / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import numpy as np
+import soundfile as sf
+
+from audio_frame_analysis import analyze_frame, analyze_frames, calculate_effective_cutoff, divide_into_frames, frame_geometry
+from audio_loader import load_flac
+from file_status_determination import (
+    ENERGY_RATIO_THRESHOLD,
+    LOSSY_CUTOFF_PROFILES,
+    PROBE_CUTOFFS_HZ,
+    RATIO_DROP_THRESHOLD,
+    _active_fractions_from_cache,
+    determine_file_status,
+    estimate_cutoff_frequency,
+    nearest_cutoff_profile,
+)
+from run_modes import run_single_file
+
+# =========================
+# Corpus
+# =========================
+FIXTURE_VERSION = 1                      # Bump when the generator changes, so cached fixtures are rebuilt
+DEFAULT_FIXTURE_DIR = Path(tempfile.gettempdir()) / "flac_authenticator_benchmark"
+SIGNALS = ("noise", "music")
+SAMPLE_RATES = (44100, 96000)
+DURATIONS_S = (10, 30)
+QUICK_SAMPLE_RATES = (44100,)
+QUICK_DURATIONS_S = (10,)
+CHANNELS = 2
+LEVEL = 0.25                             # Peak-ish amplitude; leaves headroom for 16-bit PCM
+LEGACY_FRAMES = 64                       # analyze_frame() is timed on at most this many frames per file
+MIN_TIMING_S = 0.02                      # Fast stages are called in a loop until a timing lasts at least this long
+
+SUBTYPES = {44100: "PCM_16", 48000: "PCM_16", 96000: "PCM_24"}
+
+def _fixture_name(signal: str, samplerate: int, duration_s: int, cutoff_hz) -> str:
+    band = "full" if cutoff_hz is None else f"lp{int(cutoff_hz)}"
+    return f"v{FIXTURE_VERSION}_{signal}_{samplerate}_{duration_s}s_{band}.flac"
+
+def _pink_noise(rng: np.random.Generator, num_samples: int) -> np.ndarray:
+    # White noise shaped to 1/f power in the frequency domain
+    spectrum = np.fft.rfft(rng.standard_normal(num_samples))
+    spectrum[1:] /= np.sqrt(np.arange(1, len(spectrum)))
+    spectrum[0] = 0.0
+    pink = np.fft.irfft(spectrum, n=num_samples)
+    return pink / np.max(np.abs(pink))
+
+def _music_like(rng: np.random.Generator, samplerate: int, num_samples: int) -> np.ndarray:
+    # Half-second notes of decaying harmonics over a quiet pink-noise bed (full-band, like a real master)
+    t = np.arange(num_samples) / samplerate
+    note_len = samplerate // 2
+    signal = np.zeros(num_samples)
+    for start in range(0, num_samples, note_len):
+        stop = min(start + note_len, num_samples)
+        f0 = 110.0 * 2.0 ** (rng.integers(0, 36) / 12.0)
+        envelope = np.exp(-3.0 * (t[start:stop] - t[start]))
+        for harmonic in range(1, 16):
+            if f0 * harmonic >= samplerate / 2:
+                break
+            signal[start:stop] += envelope * np.sin(2 * np.pi * f0 * harmonic * t[start:stop]) / harmonic
+    signal /= np.max(np.abs(signal))
+    return 0.8 * signal + 0.2 * _pink_noise(rng, num_samples)
+
+def _low_pass(x: np.ndarray, samplerate: int, cutoff_hz: float) -> np.ndarray:
+    # Brick-wall, like a lossy encoder's band limit: zero every bin above the cutoff
+    spectrum = np.fft.rfft(x, axis=0)
+    freqs = np.fft.rfftfreq(x.shape[0], d=1.0 / samplerate)
+    spectrum[freqs > cutoff_hz] = 0.0
+    return np.fft.irfft(spectrum, n=x.shape[0], axis=0)
+
+def generate_fixture(path: Path, signal: str, samplerate: int, duration_s: int, cutoff_hz) -> None:
+    rng = np.random.default_rng(zlib.crc32(f"{signal}/{samplerate}/{duration_s}".encode()))
+    num_samples = samplerate * duration_s
+    channels = []
+    for _ in range(CHANNELS):
+        if signal == "noise":
+            channels.append(rng.standard_normal(num_samples) / 4.0)
+        else:
+            channels.append(_music_like(rng, samplerate, num_samples))
+    audio = np.stack(channels, axis=1)
+    if cutoff_hz is not None:
+        audio = _low_pass(audio, samplerate, cutoff_hz)
+    audio = np.clip(audio * LEVEL, -1.0, 1.0)
+
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    sf.write(str(tmp_path), audio, samplerate, subtype=SUBTYPES.get(samplerate, "PCM_24"), format="FLAC")
+    os.replace(tmp_path, path)
+
+def build_corpus(fixture_dir: Path, sample_rates, durations_s) -> List[Dict[str, Any]]:
+    fixture_dir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for samplerate in sample_rates:
+        for duration_s in durations_s:
+            for signal in SIGNALS:
+                cutoffs = [c for c in PROBE_CUTOFFS_HZ if c < samplerate / 2]   # At/above Nyquist is no band limit
+                for cutoff_hz in [None, *cutoffs]:
+                    path = fixture_dir / _fixture_name(signal, samplerate, duration_s, cutoff_hz)
+                    if not path.exists():
+                        print(f"Generating {path.name}...")
+                        generate_fixture(path, signal, samplerate, duration_s, cutoff_hz)
+                    corpus.append({
+                        "name": path.stem,
+                        "path": str(path),
+                        "signal": signal,
+                        "samplerate": samplerate,
+                        "duration_s": duration_s,
+                        "cutoff_hz": cutoff_hz,
+                        "expected": "ORIGINAL" if cutoff_hz is None else "UPSCALED",
+                    })
+    return corpus
+
+# =========================
+# Measurement
+# =========================
+def best_time(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    # Best per-call time of `repeat` timings; microsecond stages are averaged over enough calls to be measurable
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        calls, start = 0, time.perf_counter()
+        while True:
+            value = fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= MIN_TIMING_S:
+                break
+        best = min(best, elapsed / calls)
+    return best, value
+
+def peak_bytes(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_fixture(fixture: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    path = fixture["path"]
+    file_mb = os.path.getsize(path) / 1e6
+    stages: Dict[str, Dict[str, float]] = {}
+
+    t, (data, samplerate) = best_time(lambda: load_flac(path), repeat)
+    stages["decode"] = {"seconds": t, "megabytes": file_mb, "megasamples": data.size / 1e6,
+                        "peak_bytes": peak_bytes(lambda: load_flac(path))}
+
+    geometry = frame_geometry(samplerate)                # The per-rate default the CLI uses
+    t, frames = best_time(lambda: divide_into_frames(data, *geometry), repeat)
+    stages["divide_frames"] = {"seconds": t, "frames": len(frames),
+                               "peak_bytes": peak_bytes(lambda: divide_into_frames(data, *geometry))}
+
+    effective_cutoff = calculate_effective_cutoff(samplerate)
+    legacy = frames[:LEGACY_FRAMES]
+    run_legacy = lambda: [analyze_frame(frame, samplerate, effective_cutoff) for frame in legacy]
+    t, _ = best_time(run_legacy, repeat)
+    stages["analyze_frame"] = {"seconds": t, "frames": len(legacy), "peak_bytes": peak_bytes(run_legacy)}
+
+    run_batched = lambda: analyze_frames(frames, samplerate, effective_cutoff)
+    t, (ratios, energy_cache) = best_time(run_batched, repeat)
+    stages["analyze_frames"] = {"seconds": t, "frames": len(frames), "megabytes": data.nbytes / 1e6,
+                                "peak_bytes": peak_bytes(run_batched)}
+
+    run_fractions = lambda: _active_fractions_from_cache(energy_cache, PROBE_CUTOFFS_HZ, ENERGY_RATIO_THRESHOLD, RATIO_DROP_THRESHOLD)
+    t, _ = best_time(run_fractions, repeat)
+    stages["active_fractions"] = {"seconds": t, "frames": len(frames), "peak_bytes": peak_bytes(run_fractions)}
+
+    run_classify = lambda: determine_file_status(ratios, effective_cutoff, energy_cache=energy_cache)
+    t, (status, confidence, _) = best_time(run_classify, repeat)
+    stages["classify"] = {"seconds": t, "files": 1, "peak_bytes": peak_bytes(run_classify)}
+
+    estimated_cutoff = estimate_cutoff_frequency(energy_cache, samplerate)
+
+    for mode, streaming in (("end_to_end", False), ("end_to_end_streaming", True)):
+        run_file = lambda: run_single_file(path, want_verbose=False, want_spectrogram=False, streaming=streaming)
+        t, _ = best_time(run_file, repeat)
+        stages[mode] = {"seconds": t, "files": 1, "megabytes": file_mb, "peak_bytes": peak_bytes(run_file)}
+
+    return {
+        **{k: v for k, v in fixture.items() if k != "path"},
+        "status": status,
+        "confidence": float(confidence),
+        "correct": fixture["expected"] in status,
+        "estimated_cutoff_hz": estimated_cutoff,
+        "estimate_agrees": _estimate_agrees(status, estimated_cutoff),
+        "stages": stages,
+    }
+
+def _estimate_agrees(status: str, estimated_cutoff) -> bool:
+    # The continuous estimate must name the same profile as the probe verdict (none for an ORIGINAL)
+    match = re.search(r"from <=(\d+) kbps", status)
+    verdict_kbps = int(match.group(1)) if match else None
+    nearest = nearest_cutoff_profile(estimated_cutoff)
+    estimate_kbps = LOSSY_CUTOFF_PROFILES[nearest] if nearest is not None else None
+    if verdict_kbps is None and "ORIGINAL" in status:
+        return estimate_kbps is None and estimated_cutoff is not None and estimated_cutoff > max(PROBE_CUTOFFS_HZ)
+    return estimate_kbps == verdict_kbps
+
+def summarize(fixture_results: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    # Throughput over the whole corpus (total work / total time), so long files weigh in proportionally
+    totals: Dict[str, Dict[str, float]] = {}
+    for result in fixture_results:
+        for stage, measured in result["stages"].items():
+            total = totals.setdefault(stage, {"peak_bytes": 0})
+            for key, value in measured.items():
+                if key == "peak_bytes":
+                    total["peak_bytes"] = max(total["peak_bytes"], value)
+                else:
+                    total[key] = total.get(key, 0.0) + value
+
+    summary = {}
+    for stage, total in totals.items():
+        seconds = total["seconds"]
+        metrics = {"seconds": seconds, "peak_mb": total["peak_bytes"] / 1e6}
+        for unit, label in (("megabytes", "mb_per_s"), ("megasamples", "msamples_per_s"),
+                            ("frames", "frames_per_s"), ("files", "files_per_s")):
+            if unit in total and seconds > 0:
+                metrics[label] = total[unit] / seconds
+        summary[stage] = metrics
+    return summary
+
+def compare_to_baseline(summary, baseline_summary, tolerance: float) -> List[str]:
+    regressions = []
+    print(f"\n{'stage':<22} {'metric':<16} {'baseline':>12} {'current':>12} {'change':>8}")
+    for stage, metrics in summary.items():
+        for metric, value in metrics.items():
+            base = baseline_summary.get(stage, {}).get(metric)
+            if metric == "seconds" or not base:
+                continue
+            change = value / base - 1.0
+            # Throughputs regress when they drop; peak memory regresses when it grows
+            regressed = change > tolerance if metric == "peak_mb" else change < -tolerance
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{stage:<22} {metric:<16} {base:12.2f} {value:12.2f} {change * 100:+7.1f}%{flag}")
+            if regressed:
+                regressions.append(f"{stage}.{metric}")
+    return regressions
+
+def print_summary(summary, fixture_results) -> None:
+    print(f"\n{'stage':<22} {'seconds':>9} {'MB/s':>9} {'frames/s':>10} {'files/s':>8} {'peak MB':>8}")
+    for stage, m in summary.items():
+        cells = [f"{m['seconds']:9.3f}"]
+        for key, width in (("mb_per_s", 9), ("frames_per_s", 10), ("files_per_s", 8)):
+            cells.append(f"{m[key]:{width}.1f}" if key in m else " " * (width - 1) + "-")
+        cells.append(f"{m['peak_mb']:8.1f}")
+        print(f"{stage:<22} " + " ".join(cells))
+    num_correct = sum(r["correct"] for r in fixture_results)
+    print(f"\nVerdicts matching the fixture's ground truth: {num_correct}/{len(fixture_results)}")
+    for r in fixture_results:
+        if not r["correct"]:
+            print(f"  {r['name']}: expected {r['expected']}, got '{r['status']}'")
+    num_agreeing = sum(r["estimate_agrees"] for r in fixture_results)
+    print(f"Cutoff estimates agreeing with the probe verdict: {num_agreeing}/{len(fixture_results)}")
+    for r in fixture_results:
+        if not r["estimate_agrees"]:
+            print(f"  {r['name']}: estimated {r['estimated_cutoff_hz']} Hz, verdict '{r['status']}'")
+
+def build_argument_parser():
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="Benchmark the analysis hot paths on a synthetic FLAC corpus.")
+    parser.add_argument("--quick", action="store_true", help="small corpus (44.1 kHz, 10 s files only)")
+    parser.add_argument("--sample-rates", type=int, nargs="+", default=None, metavar="HZ")
+    parser.add_argument("--durations", type=int, nargs="+", default=None, metavar="SECONDS")
+    parser.add_argument("--repeat", type=int, default=3, help="timings per stage; the best is kept (default: 3)")
+    parser.add_argument("--fixture-dir", type=Path, default=DEFAULT_FIXTURE_DIR,
+                        help=f"where generated fixtures are cached (default: {DEFAULT_FIXTURE_DIR})")
+    parser.add_argument("--output", type=Path, default=None, help="write the results as JSON to this path")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON from an earlier --output run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown / memory growth reported as a regression (default: 0.10)")
+    return parser
+
+def main() -> int:
+    args = build_argument_parser().parse_args()
+    sample_rates = args.sample_rates or (QUICK_SAMPLE_RATES if args.quick else SAMPLE_RATES)
+    durations_s = args.durations or (QUICK_DURATIONS_S if args.quick else DURATIONS_S)
+
+    corpus = build_corpus(args.fixture_dir, sample_rates, durations_s)
+    fixture_results = []
+    for i, fixture in enumerate(corpus, 1):
+        print(f"[{i}/{len(corpus)}] {fixture['name']}")
+        fixture_results.append(benchmark_fixture(fixture, max(1, args.repeat)))
+
+    summary = summarize(fixture_results)
+    print_summary(summary, fixture_results)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "soundfile": sf.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fixture_version": FIXTURE_VERSION,
+            "sample_rates": list(sample_rates),
+            "durations_s": list(durations_s),
+            "repeat": args.repeat,
+            "profiles": {str(k): v for k, v in LOSSY_CUTOFF_PROFILES.items()},
+        },
+        "summary": summary,
+        "fixtures": fixture_results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResults saved to '{args.output}'.")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("fixture_version") != FIXTURE_VERSION:
+            print("Warning: the baseline was measured on a different fixture version.")
+        regressions = compare_to_baseline(summary, baseline.get("summary", {}), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions beyond tolerance.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,16 @@ MODULES = [
     "run_modes.py",
     "data_and_error_logging.py",
     "audio_frame_analysis.py",
+    "batch_executors.py",
+    "scan_result_database.py",
+    "spectral_fingerprint_cache.py",
+    "adaptive_frame_sampling.py",
+    "columnar_result_output.py",
+    "file_discovery.py",
+    "scan_service.py",
+    "startup_profiler.py",
+    "stage_instrumentation.py",
+    "decoded_pcm_cache.py",
 ]
 
 AUTO_BEGIN = "<!-- AUTO-GENERATED:BEGIN -->"